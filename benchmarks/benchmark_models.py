@@ -0,0 +1,245 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+HMM_MODULE_PATH = os.path.join(REPO_DIR, "src", "Bonsai.ML.Hmm.Python", "main.py")
+LDS_MODULE_PATH = os.path.join(REPO_DIR, "src", "Bonsai.ML.Lds.Python", "main.py")
+
+def load_module(name, path):
+    # the modules are embedded resources rather than packages, so they are loaded from their source files
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def hmm_cases(hmm, quick):
+    sizes = [(2, 2), (8, 4)] if quick else [(2, 2), (8, 4), (32, 8)]
+    for num_states, dimensions in sizes:
+        params = {"K": num_states, "D": dimensions}
+
+        def infer_state(rng, num_calls, num_states=num_states, dimensions=dimensions):
+            model = hmm.HiddenMarkovModel(num_states, dimensions, "gaussian", "stationary")
+            observations = rng.normal(size=(num_calls, dimensions))
+            return lambda i: model.infer_state(observations[i])
+
+        def compute_log_alpha(rng, num_calls, num_states=num_states, dimensions=dimensions):
+            model = hmm.HiddenMarkovModel(num_states, dimensions, "gaussian", "stationary")
+            observations = rng.normal(size=(num_calls, 1, dimensions))
+            log_alpha = model.compute_log_alpha(observations[0])
+            return lambda i: model.compute_log_alpha(observations[i], log_alpha)
+
+        def compute_log_alpha_numba(rng, num_calls, num_states=num_states, dimensions=dimensions):
+            model = hmm.HiddenMarkovModel(num_states, dimensions, "gaussian", "stationary")
+            model.set_kernel_backend("numba")
+            observations = rng.normal(size=(num_calls, 1, dimensions))
+            log_alpha = model.compute_log_alpha(observations[0])
+            return lambda i: model.compute_log_alpha(observations[i], log_alpha)
+
+        yield "hmm.infer_state", params, infer_state
+        yield "hmm.compute_log_alpha", params, compute_log_alpha
+        if hmm.get_jit_kernels() is not None:
+            yield "hmm.compute_log_alpha", dict(params, backend="numba"), compute_log_alpha_numba
+
+    for batch_size in ([20, 200] if quick else [20, 200, 2000]):
+        params = {"K": 4, "D": 2, "batch_size": batch_size}
+
+        def fit_async(rng, num_calls, batch_size=batch_size):
+            model = hmm.HiddenMarkovModel(4, 2, "gaussian", "stationary")
+            observations = rng.normal(size=(num_calls, 2))
+            def step(i):
+                model.fit_async(observations[i], batch_size=batch_size, max_iter=5)
+                if model.get_fit_finished():
+                    model.reset_fit_loop()
+            return step
+
+        yield "hmm.fit_async", params, fit_async
+
+def kinematics_cases(lds, quick):
+    params = {}
+
+    def update(rng, num_calls, backend="numpy"):
+        model = lds.KalmanFilterKinematics(0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 30)
+        model.set_kernel_backend(backend)
+        observations = np.cumsum(rng.normal(size=(num_calls, 2)), axis=0)
+        def step(i):
+            model.predict()
+            model.update(observations[i, 0], observations[i, 1])
+        return step
+
+    yield "kinematics.update", params, update
+    if lds.get_jit_kernels() is not None:
+        yield "kinematics.update", {"backend": "numba"}, lambda rng, num_calls: update(rng, num_calls, "numba")
+
+    for timesteps in ([10, 100] if quick else [10, 100, 1000]):
+        params = {"timesteps": timesteps}
+
+        def forecast(rng, num_calls, timesteps=timesteps):
+            model = lds.KalmanFilterKinematics(0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 30)
+            return lambda i: model.forecast(timesteps)
+
+        yield "kinematics.forecast", params, forecast
+
+    for method in ("scipy", "gradient"):
+        for batch_size in ([50] if quick else [50, 500]):
+            params = {"method": method, "batch_size": batch_size}
+
+            def optimize(rng, num_calls, method=method, batch_size=batch_size):
+                model = lds.KalmanFilterKinematics(0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 30)
+                observations = np.cumsum(rng.normal(size=(batch_size, 2)), axis=0)
+                vars_to_estimate = {"sigma_a": True, "sqrt_diag_R": True, "R": True, "m0": True, "sqrt_diag_V0": True, "V0": True}
+                def step(i):
+                    model.batch = observations
+                    if method == "gradient":
+                        model.optimize_gradient(vars_to_estimate, max_iter=10)
+                    else:
+                        model.optimize(vars_to_estimate, max_iter=10, disp=False)
+                return step
+
+            yield "kinematics.optimize", params, optimize
+
+def linear_regression_cases(lds, quick):
+    for n_features in ([2, 64] if quick else [2, 64, 401]):
+        params = {"n_features": n_features}
+
+        def update(rng, num_calls, n_features=n_features):
+            model = lds.KalmanFilterLinearRegression(0.1, 2.0, n_features)
+            features = rng.normal(size=(num_calls, n_features))
+            responses = rng.normal(size=num_calls)
+            def step(i):
+                model.predict()
+                model.update(list(features[i]), responses[i])
+            return step
+
+        yield "linear_regression.update", params, update
+
+    for grid_size in ([50, 200] if quick else [50, 200, 500]):
+        params = {"grid_size": grid_size}
+
+        def pdf(rng, num_calls, grid_size=grid_size):
+            model = lds.KalmanFilterLinearRegression(0.1, 2.0, 2)
+            return lambda i: model.pdf(-1, 1, grid_size, -1, 1, grid_size)
+
+        yield "linear_regression.pdf", params, pdf
+
+def case_key(name, params):
+    if len(params) == 0:
+        return name
+    return name + "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+def run_case(setup, num_calls, num_warmup, seed):
+
+    # latencies are measured without tracing, peak memory in a separate traced pass
+    step = setup(np.random.default_rng(seed), num_warmup + num_calls)
+    for i in range(num_warmup):
+        step(i)
+
+    latencies = np.empty(num_calls)
+    start = time.perf_counter()
+    for i in range(num_calls):
+        t0 = time.perf_counter_ns()
+        step(num_warmup + i)
+        latencies[i] = time.perf_counter_ns() - t0
+    elapsed = time.perf_counter() - start
+
+    num_traced_calls = max(1, num_calls // 10)
+    step = setup(np.random.default_rng(seed), num_traced_calls)
+    tracemalloc.start()
+    for i in range(num_traced_calls):
+        step(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies_us = latencies / 1e3
+    return {
+        "calls": num_calls,
+        "mean_us": float(latencies_us.mean()),
+        "p50_us": float(np.percentile(latencies_us, 50)),
+        "p90_us": float(np.percentile(latencies_us, 90)),
+        "p99_us": float(np.percentile(latencies_us, 99)),
+        "max_us": float(latencies_us.max()),
+        "throughput_per_s": num_calls / elapsed if elapsed > 0 else float("inf"),
+        "peak_memory_bytes": int(peak),
+    }
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result["p50_us"] / max(baseline[key]["p50_us"], 1e-9)
+        if ratio > 1.0 + threshold:
+            regressions.append((key, baseline[key]["p50_us"], result["p50_us"], ratio))
+    return regressions
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmarks the hot paths of the HMM and LDS Python modules on synthetic data.")
+    parser.add_argument("--filter", type=str, default=None, help="Only run cases whose name contains this string.")
+    parser.add_argument("--calls", type=int, default=200, help="Number of timed calls per case.")
+    parser.add_argument("--warmup", type=int, default=20, help="Number of untimed calls per case.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data generators.")
+    parser.add_argument("--quick", action="store_true", help="Run a reduced set of model sizes.")
+    parser.add_argument("--output", type=str, default=None, help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare the results against a JSON file written with --output.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative increase of the median latency reported as a regression.")
+    args = parser.parse_args()
+
+    cases = []
+    for label, path, generators in [
+        ("hmm", HMM_MODULE_PATH, [hmm_cases]),
+        ("lds", LDS_MODULE_PATH, [kinematics_cases, linear_regression_cases]),
+    ]:
+        try:
+            module = load_module(f"bonsai_ml_{label}_main", path)
+        except ImportError as e:
+            print(f"Skipping {label} benchmarks: {e}")
+            continue
+        for generator in generators:
+            cases.extend(generator(module, args.quick))
+
+    results = {}
+    for name, params, setup in cases:
+        key = case_key(name, params)
+        if args.filter is not None and args.filter not in key:
+            continue
+        num_calls = max(1, args.calls // 20) if name == "kinematics.optimize" else args.calls
+        results[key] = dict(run_case(setup, num_calls, min(args.warmup, num_calls), args.seed), name=name, params=params)
+        result = results[key]
+        print(f"{key:<60} p50 {result['p50_us']:>12.1f} us  p99 {result['p99_us']:>12.1f} us  "
+              f"{result['throughput_per_s']:>12.1f} calls/s  peak {result['peak_memory_bytes'] / 1024:>10.1f} KiB")
+
+    report = {
+        "metadata": {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "seed": args.seed,
+            "calls": args.calls,
+        },
+        "results": results,
+    }
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, baseline_p50, p50, ratio in regressions:
+            print(f"REGRESSION {key}: p50 {baseline_p50:.1f} us -> {p50:.1f} us ({ratio:.2f}x)")
+        if len(regressions) > 0:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+MODULE_PATHS = {
+    "hmm": os.path.join(REPO_DIR, "src", "Bonsai.ML.Hmm.Python", "main.py"),
+    "lds": os.path.join(REPO_DIR, "src", "Bonsai.ML.Lds.Python", "main.py"),
+}
+# start-up target for LoadHMMModule and LoadLDSModule, in seconds
+DEFAULT_BUDGET = 2.5
+
+# loads the module the same way as the benchmarks and prints the wall time of the module body alone
+LOADER = """
+import importlib.util, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("bonsai_ml_main", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(time.perf_counter() - start)
+"""
+
+def parse_importtime(stderr):
+    # each line is "import time: <self us> | <cumulative us> | <indented package name>"
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return imports
+
+def profile_module(path, python):
+    # a fresh interpreter is used for every run so that no module is already cached in sys.modules
+    result = subprocess.run([python, "-X", "importtime", "-c", LOADER, path], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return float(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Reports the start-up import time of the HMM and LDS Python modules.")
+    parser.add_argument("--module", type=str, choices=sorted(MODULE_PATHS), action="append", default=None, help="Only profile this module. Can be repeated.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of fresh interpreters per module. The fastest run is reported.")
+    parser.add_argument("--top", type=int, default=15, help="Number of top-level imports listed per module.")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Exit with a non-zero status if any module takes longer than this many seconds to load. Zero disables the check.")
+    parser.add_argument("--python", type=str, default=sys.executable, help="Interpreter used to load the modules.")
+    args = parser.parse_args()
+
+    over_budget = []
+    for label in args.module or sorted(MODULE_PATHS):
+        runs = []
+        for _ in range(max(1, args.repeat)):
+            try:
+                runs.append(profile_module(MODULE_PATHS[label], args.python))
+            except RuntimeError as e:
+                print(f"Skipping {label}: {e}")
+                break
+        if len(runs) == 0:
+            continue
+
+        elapsed, imports = min(runs, key=lambda run: run[0])
+        print(f"{label}: {elapsed * 1e3:.1f} ms to load {MODULE_PATHS[label]}")
+        top_level = sorted((entry for entry in imports if entry[3] == 0), key=lambda entry: entry[2], reverse=True)
+        for name, _, cumulative, _ in top_level[:args.top]:
+            print(f"  {cumulative / 1e3:>10.1f} ms  {name}")
+
+        if args.budget > 0 and elapsed > args.budget:
+            over_budget.append((label, elapsed))
+
+    for label, elapsed in over_budget:
+        print(f"OVER BUDGET {label}: {elapsed:.3f} s > {args.budget:.3f} s")
+    if len(over_budget) > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -51,6 +51,33 @@ namespace Bonsai.ML.Hmm.Python.Observations
         [XmlIgnore]
         public long[] PredictedStates { get; set; }
 
+        /// <summary>
+        /// The number of observations in the batch assigned to each state.
+        /// </summary>
+        [Description("The number of observations in the batch assigned to each state.")]
+        [XmlIgnore]
+        public double[] ObservationCounts { get; set; }
+
+        /// <summary>
+        /// The empirical means of the batch observations assigned to each state.
+        /// </summary>
+        [Description("The empirical means of the batch observations assigned to each state.")]
+        [XmlIgnore]
+        public double[,] ObservationMeans { get; set; }
+
+        /// <summary>
+        /// The empirical covariance matrices of the batch observations assigned to each state.
+        /// </summary>
+        [Description("The empirical covariance matrices of the batch observations assigned to each state.")]
+        [XmlIgnore]
+        public double[,,] ObservationCovarianceMatrices { get; set; }
+
+        /// <summary>
+        /// Gets or sets a value indicating whether to read the per-state counts, means and covariances of the batch observations.
+        /// </summary>
+        [Description("Indicates whether to read the per-state counts, means and covariances of the batch observations.")]
+        public bool IncludeObservationSummaries { get; set; } = false;
+
         /// <summary>
         /// Transforms an observable sequence of <see cref="PyObject"/> into an observable sequence 
         /// of <see cref="GaussianObservationStatistics"/> objects by accessing internal attributes of the <see cref="PyObject"/>.
@@ -66,7 +93,7 @@ namespace Bonsai.ML.Hmm.Python.Observations
                 var batchObservationsPyObj = (double[,])pyObject.GetArrayAttr("batch_observations");
                 var predictedStatesPyObj = (long[])pyObject.GetArrayAttr("predicted_states");
 
-                return new GaussianObservationStatistics
+                var statistics = new GaussianObservationStatistics
                 {
                     Means = meansPyObj,
                     StdDevs = stdDevsPyObj,
@@ -74,6 +101,16 @@ namespace Bonsai.ML.Hmm.Python.Observations
                     BatchObservations = batchObservationsPyObj,
                     PredictedStates = predictedStatesPyObj
                 };
+
+                // the visualizers only use the model parameters and the batch, so the summaries are only marshalled on request
+                if (IncludeObservationSummaries)
+                {
+                    statistics.ObservationCounts = (double[])pyObject.GetArrayAttr("observation_counts");
+                    statistics.ObservationMeans = (double[,])pyObject.GetArrayAttr("observation_means");
+                    statistics.ObservationCovarianceMatrices = (double[,,])pyObject.GetArrayAttr("observation_covariances");
+                }
+
+                return statistics;
             });
         }
 
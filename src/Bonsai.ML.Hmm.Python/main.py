@@ -1,22 +1,603 @@
-from concurrent.futures import ThreadPoolExecutor
-from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
 import threading
-import asyncio
+import time
+import sys
+import os
 from ssm import HMM, util
 import numpy as np
-import autograd.numpy.random as npr
-from scipy.optimize import linear_sum_assignment
-from scipy.special import logsumexp
+from scipy.special import logsumexp, gammaln
 import pickle
+import json
+from collections import deque
 
-npr.seed(0)
+STATIONARY_TRANSITION_MODEL_TYPES = ("standard", "stationary", "constrained", "sticky")
+ONLINE_EM_OBSERVATION_MODEL_TYPES = ("gaussian", "poisson", "bernoulli", "exponential")
+FIT_BACKENDS = ("thread", "process")
+KERNEL_BACKENDS = ("numpy", "numba")
+MODEL_ARCHIVE_SCHEMA_VERSION = 1
+# _forward is the single-step forward pass shared by infer_state and compute_log_alpha
+INSTRUMENTED_METHODS = ("infer_state", "infer_state_batch", "infer_state_from_buffer", "_forward", "fit_async")
+# observation models whose likelihood only depends on the current observation,
+# so that observations from different streams can be evaluated in a single call
+MEMORYLESS_OBSERVATION_MODEL_TYPES = ("gaussian", "diagonal_gaussian", "studentst", "diagonal_t", "exponential", "bernoulli", "categorical", "poisson", "vonmises")
+
+# The module is loaded by Bonsai from an embedded resource, so worker processes cannot
+# import it. The code needed by the workers is kept as source and registered as a
+# module of its own, both here and in each worker, so that its functions can be pickled.
+FIT_WORKER_MODULE_NAME = "bonsai_ml_hmm_fit_worker"
+
+FIT_WORKER_SOURCE = """
+def fit(model_kwargs, params, batch, fit_kwargs):
+    from ssm import HMM
+    model = HMM(**model_kwargs)
+    model.params = params
+    model.fit(batch, **fit_kwargs)
+    return model.params
+
+def ping():
+    return True
+"""
+
+FIT_WORKER_BOOTSTRAP = """
+import sys
+import types
+if name not in sys.modules:
+    module = types.ModuleType(name)
+    exec(source, module.__dict__)
+    sys.modules[name] = module
+"""
+
+def _load_fit_worker_module():
+    exec(FIT_WORKER_BOOTSTRAP, {"name": FIT_WORKER_MODULE_NAME, "source": FIT_WORKER_SOURCE})
+    return sys.modules[FIT_WORKER_MODULE_NAME]
+
+def _get_python_executable():
+    # when python is embedded in Bonsai, sys.executable points to the host application
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    for candidate in [os.path.join(sys.prefix, "python.exe"),
+                      os.path.join(sys.prefix, "Scripts", "python.exe"),
+                      os.path.join(sys.prefix, "bin", "python3"),
+                      os.path.join(sys.prefix, "bin", "python")]:
+        if os.path.isfile(candidate):
+            return candidate
+    return sys.executable
+
+class FitWorkerPool:
+
+    def __init__(self, num_workers: int = 1):
+        self.num_workers = num_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                # only the process backend needs multiprocessing, so it is imported on first use
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                context = multiprocessing.get_context("spawn")
+                context.set_executable(_get_python_executable())
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    mp_context=context,
+                    initializer=exec,
+                    initargs=(FIT_WORKER_BOOTSTRAP, {"name": FIT_WORKER_MODULE_NAME, "source": FIT_WORKER_SOURCE})
+                )
+                worker = _load_fit_worker_module()
+                for _ in range(self.num_workers):
+                    self._executor.submit(worker.ping)
+            return self._executor
+
+    def submit(self, func_name, *args):
+        executor = self.start()
+        worker = _load_fit_worker_module()
+        return executor.submit(getattr(worker, func_name), *args)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+_fit_worker_pool = None
+
+def get_fit_worker_pool(num_workers: int = 1):
+    global _fit_worker_pool
+    if _fit_worker_pool is None:
+        _fit_worker_pool = FitWorkerPool(num_workers)
+    return _fit_worker_pool
+
+class FitJob:
+
+    def __init__(self, key, func, args, kwargs, on_completion):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_completion = on_completion
+        self.future = Future()
+        self.submitted_time = time.perf_counter()
+        self.started_time = None
+        self.finished_time = None
+
+class FitScheduler:
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._running = {}
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "dropped": 0,
+            "cancelled": 0
+        }
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._total_run_time = 0.0
+        self._max_run_time = 0.0
+
+    def submit(self, key, func, *args, on_completion=None, **kwargs):
+        job = FitJob(key, func, args, kwargs, on_completion)
+        with self._lock:
+            self._counters["submitted"] += 1
+            # only the most recent job is kept for each key, older batches are stale
+            stale_job = self._pending.pop(key, None)
+            if stale_job is not None:
+                stale_job.future.cancel()
+                self._counters["dropped"] += 1
+            self._pending[key] = job
+            self._dispatch()
+        return job.future
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def is_running(self, key):
+        with self._lock:
+            return key in self._running
+
+    def cancel(self, key):
+        # jobs that have already started cannot be interrupted and will run to completion
+        with self._lock:
+            job = self._pending.pop(key, None)
+            if job is None:
+                return False
+            job.future.cancel()
+            self._counters["cancelled"] += 1
+            return True
+
+    def _dispatch(self):
+        for key in list(self._pending.keys()):
+            if len(self._running) >= self.max_workers:
+                break
+            if key in self._running:
+                continue
+            job = self._pending.pop(key)
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            job.started_time = time.perf_counter()
+            wait_time = job.started_time - job.submitted_time
+            self._total_wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+            self._running[key] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            result = job.func(*job.args, **job.kwargs)
+        except BaseException as e:
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(result)
+
+        try:
+            if job.on_completion is not None:
+                job.on_completion(job.future)
+        finally:
+            job.finished_time = time.perf_counter()
+            run_time = job.finished_time - job.started_time
+            metrics = getattr(job.key, "_metrics", None)
+            if metrics is not None:
+                metrics.record_fit(job.started_time - job.submitted_time, run_time)
+            with self._lock:
+                del self._running[job.key]
+                self._counters["failed" if job.future.exception() is not None else "completed"] += 1
+                self._total_run_time += run_time
+                self._max_run_time = max(self._max_run_time, run_time)
+                self._dispatch()
+
+    def get_metrics(self):
+        with self._lock:
+            started = self._counters["completed"] + self._counters["failed"] + len(self._running)
+            finished = self._counters["completed"] + self._counters["failed"]
+            return {
+                **self._counters,
+                "queue_depth": len(self._pending),
+                "running": len(self._running),
+                "max_workers": self.max_workers,
+                "mean_wait_time": self._total_wait_time / started if started > 0 else 0.0,
+                "max_wait_time": self._max_wait_time,
+                "mean_run_time": self._total_run_time / finished if finished > 0 else 0.0,
+                "max_run_time": self._max_run_time
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            for job in self._pending.values():
+                job.future.cancel()
+            self._pending.clear()
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+_fit_scheduler = None
+
+def get_fit_scheduler(max_workers: int = 2):
+    global _fit_scheduler
+    if _fit_scheduler is None:
+        _fit_scheduler = FitScheduler(max_workers)
+    return _fit_scheduler
+
+class ModelMetrics:
+
+    # latencies are counted in power-of-two microsecond buckets, an HDR-style histogram with one significant bit
+    NUM_BUCKETS = 40
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._fit_count = 0
+        self._fit_total_time = 0.0
+        self._fit_max_time = 0.0
+        self._fit_last_time = 0.0
+        self._fit_total_wait_time = 0.0
+        self._fit_max_wait_time = 0.0
+
+    def record_call(self, name, elapsed_ns):
+        entry = self._calls.get(name)
+        if entry is None:
+            entry = self._calls[name] = [0, 0, 0, [0] * self.NUM_BUCKETS]
+        entry[0] += 1
+        entry[1] += elapsed_ns
+        if elapsed_ns > entry[2]:
+            entry[2] = elapsed_ns
+        entry[3][min((elapsed_ns // 1000).bit_length(), self.NUM_BUCKETS - 1)] += 1
+
+    def record_fit(self, wait_time, run_time):
+        with self._lock:
+            self._fit_count += 1
+            self._fit_total_time += run_time
+            self._fit_max_time = max(self._fit_max_time, run_time)
+            self._fit_last_time = run_time
+            self._fit_total_wait_time += wait_time
+            self._fit_max_wait_time = max(self._fit_max_wait_time, wait_time)
+
+    @staticmethod
+    def _percentile(histogram, count, q):
+        # upper bound of the bucket holding the q-th quantile
+        target = q * count
+        cumulative = 0
+        for bucket, bucket_count in enumerate(histogram):
+            cumulative += bucket_count
+            if cumulative >= target and bucket_count > 0:
+                return float(2 ** bucket)
+        return 0.0
+
+    def snapshot(self):
+        calls = {}
+        for name, (count, total_ns, max_ns, histogram) in list(self._calls.items()):
+            histogram = list(histogram)
+            calls[name] = {
+                "count": count,
+                "total_time": total_ns / 1e9,
+                "mean_us": total_ns / count / 1e3 if count > 0 else 0.0,
+                "max_us": max_ns / 1e3,
+                "p50_us": self._percentile(histogram, count, 0.5),
+                "p99_us": self._percentile(histogram, count, 0.99),
+                "histogram": [[float(2 ** bucket), bucket_count] for bucket, bucket_count in enumerate(histogram) if bucket_count > 0]
+            }
+        with self._lock:
+            fits = {
+                "count": self._fit_count,
+                "mean_time": self._fit_total_time / self._fit_count if self._fit_count > 0 else 0.0,
+                "max_time": self._fit_max_time,
+                "last_time": self._fit_last_time,
+                "mean_wait_time": self._fit_total_wait_time / self._fit_count if self._fit_count > 0 else 0.0,
+                "max_wait_time": self._fit_max_wait_time
+            }
+        return {"calls": calls, "fits": fits}
+
+def _timed_method(metrics, name, method):
+    perf_counter_ns = time.perf_counter_ns
+    def timed(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.record_call(name, perf_counter_ns() - start)
+    return timed
+
+def set_metrics_enabled(model, method_names, enabled):
+    # instrumented methods are bound on the instance and removed again when disabled,
+    # so that a model without metrics runs the plain class methods with no extra checks
+    for name in method_names:
+        model.__dict__.pop(name, None)
+    if enabled:
+        if model._metrics is None:
+            model._metrics = ModelMetrics()
+        for name in method_names:
+            setattr(model, name, _timed_method(model._metrics, name, getattr(model, name)))
+    else:
+        model._metrics = None
+
+def get_model_metrics(model, buffers):
+    metrics = {"enabled": model._metrics is not None, "buffers": buffers, "scheduler": get_fit_scheduler().get_metrics()}
+    if model._metrics is not None:
+        metrics.update(model._metrics.snapshot())
+    return metrics
+
+BUFFER_DTYPES = ("float32", "float64", "int32", "int64")
+
+def array_from_buffer(buffer, dtype = "float64", shape = None):
+    # wraps bytes, bytearray, memoryview or ndarray data without copying whenever the dtype already matches
+    if dtype not in BUFFER_DTYPES:
+        raise ValueError(f"Unsupported buffer dtype: {dtype}. Expected one of {BUFFER_DTYPES}.")
+    if isinstance(buffer, np.ndarray):
+        array = np.asarray(buffer, dtype=dtype)
+    else:
+        array = np.frombuffer(buffer, dtype=dtype)
+    if shape is not None:
+        array = array.reshape(shape)
+    return array
+
+def array_to_buffer(array, dtype = None):
+    array = np.ascontiguousarray(array, dtype=dtype)
+    return array.dtype.name, array.shape, memoryview(array)
+
+def _build_kernels(jit):
+
+    # scalar loops over preallocated arrays, compiled with numba they avoid the temporaries
+    # and call overhead of the equivalent numpy expressions on small models
+
+    @jit
+    def normalize_log(values):
+        m = values.max()
+        total = 0.0
+        for i in range(values.shape[0]):
+            total += np.exp(values[i] - m)
+        shift = m + np.log(total)
+        for i in range(values.shape[0]):
+            values[i] -= shift
+
+    @jit
+    def gaussian_log_likelihood(y, means, cholesky, log_normalizer, out, whitened):
+        # solves L z = y - mu by forward substitution for every state
+        num_states, dimensions = means.shape
+        for k in range(num_states):
+            total = 0.0
+            for i in range(dimensions):
+                value = y[i] - means[k, i]
+                for j in range(i):
+                    value -= cholesky[k, i, j] * whitened[j]
+                value /= cholesky[k, i, i]
+                whitened[i] = value
+                total += value * value
+            out[k] = log_normalizer[k] - 0.5 * total
+
+    @jit
+    def forward_step(log_alpha, transition_matrix, log_likelihood, out, alpha):
+        # out may alias log_alpha, which is not read after alpha is filled
+        num_states = log_alpha.shape[0]
+        m = log_alpha.max()
+        for i in range(num_states):
+            alpha[i] = np.exp(log_alpha[i] - m)
+        for j in range(num_states):
+            total = 0.0
+            for i in range(num_states):
+                total += alpha[i] * transition_matrix[i, j]
+            out[j] = np.log(total) + m + log_likelihood[j]
+        normalize_log(out)
+
+    @jit
+    def gaussian_forward_batch(observations, means, cholesky, log_normalizer, log_initial_state_distribution,
+                               transition_matrix, log_alpha, initialized, log_alphas, log_likelihoods, whitened, alpha):
+        for t in range(observations.shape[0]):
+            gaussian_log_likelihood(observations[t], means, cholesky, log_normalizer, log_likelihoods[t], whitened)
+            if t > 0:
+                forward_step(log_alphas[t - 1], transition_matrix, log_likelihoods[t], log_alphas[t], alpha)
+            elif initialized:
+                forward_step(log_alpha, transition_matrix, log_likelihoods[t], log_alphas[t], alpha)
+            else:
+                for k in range(log_initial_state_distribution.shape[0]):
+                    log_alphas[t, k] = log_initial_state_distribution[k] + log_likelihoods[t, k]
+                normalize_log(log_alphas[t])
+
+    return {
+        "gaussian_log_likelihood": gaussian_log_likelihood,
+        "forward_step": forward_step,
+        "gaussian_forward_batch": gaussian_forward_batch,
+    }
+
+_jit_kernels = None
+
+def get_jit_kernels():
+    # numba is optional and slow to import, so it is only loaded when a model selects it.
+    # None is returned when it is not installed and models keep using numpy.
+    global _jit_kernels
+    if _jit_kernels is None:
+        try:
+            import numba
+        except ImportError:
+            _jit_kernels = False
+        else:
+            _jit_kernels = _build_kernels(numba.njit)
+    return _jit_kernels or None
+
+_global_rng_seeded = False
+
+def seed_global_rng():
+    # ssm draws random initial parameters from the global numpy generator, which is seeded
+    # before the first model is built instead of when the module is loaded
+    global _global_rng_seeded
+    if not _global_rng_seeded:
+        np.random.seed(0)
+        _global_rng_seeded = True
+
+def _split_archive_kwargs(kwargs, prefix, arrays):
+    # arrays are stored as archive members, everything else as json metadata
+    if kwargs is None:
+        return None
+    metadata = {}
+    for key, value in kwargs.items():
+        if isinstance(value, np.ndarray):
+            arrays[f"{prefix}/{key}"] = value
+            metadata[key] = {"array": True}
+        elif isinstance(value, (bool, int, float, str, list, tuple, np.generic)) or value is None:
+            metadata[key] = {"value": value.tolist() if isinstance(value, np.generic) else value}
+        else:
+            raise TypeError(f"Cannot store {prefix} argument '{key}' of type {type(value).__name__} in a model archive.")
+    return metadata
+
+def _merge_archive_kwargs(metadata, prefix, archive):
+    if metadata is None:
+        return None
+    return {key: archive[f"{prefix}/{key}"] if entry.get("array") else entry["value"] for key, entry in metadata.items()}
+
+def _map_archive_members(path, archive, mmap_mode):
+    # np.savez stores members uncompressed, so their data can be memory-mapped straight from the zip file.
+    # compressed or empty members are read as usual
+    import struct
+    import zipfile
+    arrays = {}
+    with zipfile.ZipFile(path) as zip_file, open(path, "rb") as f:
+        for info in zip_file.infolist():
+            key = info.filename[:-len(".npy")] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[key] = archive[key]
+                continue
+            # the local header can carry a different extra field than the central directory entry
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject or np.prod(shape) == 0:
+                arrays[key] = archive[key]
+                continue
+            arrays[key] = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape, order="F" if fortran_order else "C")
+    return arrays
 
 class CustomUnpickler(pickle.Unpickler):
     def find_class(self, module, name):
-        if module == 'main' and name == 'HiddenMarkovModel':
-            return HiddenMarkovModel
+        if module == 'main' and name in ('HiddenMarkovModel', 'RingBuffer', 'BatchWindow'):
+            return globals()[name]
         return super().find_class(module, name)
 
+class RingBuffer:
+
+    def __init__(self, capacity: int, shape: tuple = (), dtype=float):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = int(capacity)
+        # every element is written twice, once in each half of the storage, so that
+        # the ordered contents are always available as a single contiguous slice
+        self._data = np.zeros((2 * self.capacity,) + self.shape, dtype=self.dtype)
+        self._start = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, value):
+        if self.capacity == 0:
+            return
+        index = (self._start + self._count) % self.capacity
+        self._data[index] = value
+        self._data[index + self.capacity] = value
+        if self._count < self.capacity:
+            self._count += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.dtype).reshape((-1,) + self.shape)
+        if self.capacity == 0 or values.shape[0] == 0:
+            return
+        values = values[-self.capacity:]
+        num_values = values.shape[0]
+        indices = (self._start + self._count + np.arange(num_values)) % self.capacity
+        self._data[indices] = values
+        self._data[indices + self.capacity] = values
+        overflow = max(self._count + num_values - self.capacity, 0)
+        self._count = min(self._count + num_values, self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+
+    def view(self):
+        return self._data[self._start:self._start + self._count]
+
+    def resize(self, capacity):
+        values = self.view().copy()
+        self._allocate(capacity)
+        self.extend(values)
+
+    def clear(self):
+        self._start = 0
+        self._count = 0
+
+class BatchWindow:
+
+    def __init__(self, shape: tuple = (), dtype=float, capacity: int = 16):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._data = np.empty((max(int(capacity), 1),) + self.shape, dtype=self.dtype)
+        self._start = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        end = self._start + self._count
+        if end == len(self._data):
+            # storage is replaced rather than compacted in place, so views handed out earlier keep their contents
+            data = np.empty((max(2 * self._count, 16),) + self.shape, dtype=self.dtype)
+            data[:self._count] = self.view()
+            self._data = data
+            self._start = 0
+            end = self._count
+        self._data[end] = value
+        self._count += 1
+
+    def extend(self, values):
+        for value in np.asarray(values, dtype=self.dtype).reshape((-1,) + self.shape):
+            self.append(value)
+
+    def evict(self, count: int = 1):
+        count = min(count, self._count)
+        self._start += count
+        self._count -= count
+
+    def view(self):
+        return self._data[self._start:self._start + self._count]
+
+    def clear(self):
+        self.evict(self._count)
+
 class HiddenMarkovModel(HMM):
 
     def __init__(
@@ -32,6 +613,8 @@ class HiddenMarkovModel(HMM):
         transitions_kwargs: dict = None
     ):
 
+        seed_global_rng()
+
         self.num_states = num_states
         self.dimensions = dimensions
         self.observation_model_type = observation_model_type
@@ -53,6 +636,9 @@ class HiddenMarkovModel(HMM):
                 transitions_kwargs["nonlinearity"] = value
                 transitions_kwargs.pop(key)
 
+        self.observations_kwargs = observations_kwargs
+        self.transitions_kwargs = transitions_kwargs
+
         super(HiddenMarkovModel, self).__init__(
             K=self.num_states, 
             D=self.dimensions, 
@@ -62,6 +648,32 @@ class HiddenMarkovModel(HMM):
             transition_kwargs=transitions_kwargs
         )
 
+        self._params_version = 0
+        self._cache_version = -1
+        self._transition_matrix = None
+        self._log_transition_matrix = None
+        self._log_initial_state_distribution = None
+        self._sparse_transition_matrix = None
+        self._sparse_forward_plan = None
+        self.sparse_transition_tolerance = None
+        self.transition_approximation_error = None
+        self.kernel_backend = "numpy"
+        self._kernels = None
+        self._kernel_ready = False
+        self._gaussian_means = None
+        self._gaussian_cholesky = None
+        self._gaussian_inverse_cholesky = None
+        self._gaussian_log_normalizer = None
+        self._linear_log_likelihood_weights = None
+        self._linear_log_likelihood_bias = None
+        self._categorical_log_probabilities = None
+        self._kernel_log_likelihood = None
+        self._kernel_whitened = None
+        self._kernel_alpha = None
+
+        self._online_em_stats = None
+        self._online_em_count = 0
+
         self.update_params(initial_state_distribution,
                            transitions_params, observations_params)
         
@@ -82,16 +694,216 @@ class HiddenMarkovModel(HMM):
         self.log_alpha = None
         self.state_probabilities = None
 
-        self.batch = None
-        self.batch_observations = np.array([[]], dtype=float).reshape((0, dimensions))
+        self.fixed_lag = None
+        self.smoothed_state = None
+        self.smoothed_state_probabilities = None
+        self._lag_log_alphas = None
+        self._lag_transition_matrices = None
+        self._lag_log_likelihoods = None
+
+        self.online_viterbi = False
+        self.viterbi_max_lag = None
+        self._viterbi_delta = None
+        self._viterbi_backpointers = []
+
+        self._batch_window = BatchWindow(shape=(dimensions,), dtype=float)
+        self._batch_observations = RingBuffer(250, shape=(dimensions,), dtype=float)
+        self._predicted_states = RingBuffer(250, dtype=np.int64)
+        self._smoothed_states = RingBuffer(250, dtype=np.int64)
+        self._viterbi_states = RingBuffer(250, dtype=np.int64)
+        self._state_counts = None
+        self._metrics = None
         self.is_running = False
         self._fit_finished = False
-        self.loop = None
-        self.thread = None
+        self._batch_reset_pending = False
+        self._consumed_batch_rows = 0
         self.curr_batch_size = 0
         self.flush_data_between_batches = True
-        self.predicted_states = np.array([], dtype=int)
-        self.buffer_count = 250
+
+    def __getstate__(self):
+        # instrumented methods are closures bound to this instance and are not pickled
+        state = self.__dict__.copy()
+        for name in INSTRUMENTED_METHODS:
+            state.pop(name, None)
+        state["_metrics"] = None
+        state["_kernels"] = None
+        return state
+
+    def __setstate__(self, state):
+        # models pickled before the observation history moved to ring buffers
+        # stored the history as plain arrays
+        if "_predicted_states" not in state:
+            buffer_count = state.pop("buffer_count", 250)
+            batch_observations = state.pop("batch_observations")
+            predicted_states = state.pop("predicted_states")
+            state["_batch_observations"] = RingBuffer(buffer_count, shape=batch_observations.shape[1:], dtype=float)
+            state["_batch_observations"].extend(batch_observations)
+            state["_predicted_states"] = RingBuffer(buffer_count, dtype=np.int64)
+            state["_predicted_states"].extend(predicted_states)
+        state.setdefault("_params_version", 0)
+        state.setdefault("_batch_reset_pending", False)
+        state.setdefault("_consumed_batch_rows", 0)
+        state["_cache_version"] = -1
+        state.setdefault("_sparse_transition_matrix", None)
+        state.setdefault("_sparse_forward_plan", None)
+        state.setdefault("sparse_transition_tolerance", None)
+        state.setdefault("transition_approximation_error", None)
+        state.pop("_forward_scratch", None)
+        state.setdefault("kernel_backend", "numpy")
+        state["_kernels"] = get_jit_kernels() if state["kernel_backend"] == "numba" else None
+        if state["_kernels"] is None:
+            state["kernel_backend"] = "numpy"
+        state["_kernel_ready"] = False
+        state.setdefault("_gaussian_means", None)
+        state.setdefault("_gaussian_cholesky", None)
+        state.setdefault("_gaussian_inverse_cholesky", None)
+        state.setdefault("_gaussian_log_normalizer", None)
+        state.setdefault("_linear_log_likelihood_weights", None)
+        state.setdefault("_linear_log_likelihood_bias", None)
+        state.setdefault("_categorical_log_probabilities", None)
+        state.setdefault("_online_em_stats", None)
+        state.setdefault("_online_em_count", 0)
+        state.setdefault("observations_kwargs", None)
+        state.setdefault("transitions_kwargs", None)
+        buffer_count = state["_predicted_states"].capacity
+        state.setdefault("_smoothed_states", RingBuffer(buffer_count, dtype=np.int64))
+        state.setdefault("_viterbi_states", RingBuffer(buffer_count, dtype=np.int64))
+        state.setdefault("fixed_lag", None)
+        state.setdefault("smoothed_state", None)
+        state.setdefault("smoothed_state_probabilities", None)
+        state.setdefault("_lag_log_alphas", None)
+        state.setdefault("_lag_transition_matrices", None)
+        state.setdefault("_lag_log_likelihoods", None)
+        state.setdefault("online_viterbi", False)
+        state.setdefault("viterbi_max_lag", None)
+        state.setdefault("_viterbi_delta", None)
+        state.setdefault("_viterbi_backpointers", [])
+        state.setdefault("_metrics", None)
+        if "_batch_window" not in state:
+            batch = state.pop("batch", None)
+            state["_batch_window"] = BatchWindow(shape=(state["dimensions"],), dtype=float)
+            if batch is not None:
+                state["_batch_window"].extend(batch)
+        state.setdefault("_state_counts", None)
+        self.__dict__.update(state)
+
+    @property
+    def buffer_count(self):
+        return self._predicted_states.capacity
+
+    @buffer_count.setter
+    def buffer_count(self, value):
+        self._batch_observations.resize(value)
+        self._predicted_states.resize(value)
+        self._smoothed_states.resize(value)
+        self._viterbi_states.resize(value)
+        if self._state_counts is not None:
+            self._reset_observation_statistics()
+
+    @property
+    def batch(self):
+        if len(self._batch_window) == 0:
+            return None
+        return self._batch_window.view()
+
+    @batch.setter
+    def batch(self, value):
+        self._batch_window.clear()
+        if value is not None:
+            self._batch_window.extend(value)
+
+    @property
+    def batch_observations(self):
+        return self._batch_observations.view()
+
+    @property
+    def predicted_states(self):
+        return self._predicted_states.view()
+
+    @property
+    def smoothed_states(self):
+        return self._smoothed_states.view()
+
+    @property
+    def viterbi_states(self):
+        return self._viterbi_states.view()
+
+    @property
+    def observation_counts(self):
+        self._track_observation_statistics()
+        return self._state_counts
+
+    @property
+    def observation_means(self):
+        self._track_observation_statistics()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._state_sums / self._state_counts[:, np.newaxis]
+
+    @property
+    def observation_covariances(self):
+        means = self.observation_means
+        with np.errstate(invalid="ignore", divide="ignore"):
+            second_moments = self._state_outer_sums / self._state_counts[:, np.newaxis, np.newaxis]
+        return second_moments - means[:, :, np.newaxis] * means[:, np.newaxis, :]
+
+    def _track_observation_statistics(self):
+        # the running statistics are only kept once a summary has been requested, so models
+        # whose summaries are never read do not pay for the per-sample outer products
+        if self._state_counts is None:
+            self._reset_observation_statistics()
+
+    def _reset_observation_statistics(self):
+        # per-state counts, sums and outer-product sums of the observations currently in the window
+        observations = self.batch_observations
+        states = self.predicted_states
+        self._state_counts = np.bincount(states, minlength=self.num_states).astype(float)
+        self._state_sums = np.zeros((self.num_states, self.dimensions))
+        self._state_outer_sums = np.zeros((self.num_states, self.dimensions, self.dimensions))
+        np.add.at(self._state_sums, states, observations)
+        np.add.at(self._state_outer_sums, states, observations[:, :, np.newaxis] * observations[:, np.newaxis, :])
+        self._statistics_evictions = 0
+
+    def _accumulate_observation_statistics(self, observations, states, sign):
+        if len(states) == 1:
+            state = states[0]
+            observation = observations[0]
+            self._state_counts[state] += sign
+            self._state_sums[state] += sign * observation
+            self._state_outer_sums[state] += sign * np.outer(observation, observation)
+        elif len(states) > 1:
+            np.add.at(self._state_counts, states, sign)
+            np.add.at(self._state_sums, states, sign * observations)
+            np.add.at(self._state_outer_sums, states, sign * observations[:, :, np.newaxis] * observations[:, np.newaxis, :])
+
+    def _push_history(self, observations, states):
+
+        observations = np.asarray(observations, dtype=float).reshape((-1, self.dimensions))
+        states = np.asarray(states, dtype=np.int64).reshape(-1)
+
+        count = len(self._predicted_states)
+        overflow = count + len(states) - self.buffer_count
+        skipped = 0
+        tracking = self._state_counts is not None
+        if overflow > 0:
+            # the oldest samples leave the window, and new samples that do not fit are never added
+            evicted = min(overflow, count)
+            skipped = overflow - evicted
+            if tracking:
+                self._accumulate_observation_statistics(self.batch_observations[:evicted], self.predicted_states[:evicted], -1)
+                self._statistics_evictions += evicted
+
+        if tracking:
+            self._accumulate_observation_statistics(observations[skipped:], states[skipped:], 1)
+        if len(states) == 1:
+            self._predicted_states.push(states[0])
+            self._batch_observations.push(observations[0])
+        else:
+            self._predicted_states.extend(states)
+            self._batch_observations.extend(observations)
+
+        # recompute from the window every buffer_count evictions to bound the rounding error of the running sums
+        if tracking and self._statistics_evictions >= self.buffer_count:
+            self._reset_observation_statistics()
 
     def update_params(self, initial_state_distribution, transitions_params, observations_params):
         hmm_params = self.params
@@ -128,66 +940,552 @@ class HiddenMarkovModel(HMM):
         else:
             self.observations_params = (hmm_params[2],)
 
+        self.invalidate_cache()
+
+    def permute(self, perm):
+        super(HiddenMarkovModel, self).permute(perm)
+        self.invalidate_cache()
+
+    def invalidate_cache(self):
+        self._params_version += 1
+
+    def _refresh_cache(self):
+        version = self._params_version
+        if self._cache_version == version:
+            return
+
+        # the fit thread refreshes the cache while inference reads it, so everything is built into
+        # locals first and published afterwards, with the version last
+        log_initial_state_distribution = np.log(self.init_state_distn.initial_state_distn)
+        if self.transition_model_type in STATIONARY_TRANSITION_MODEL_TYPES:
+            transition_matrix = self.transitions.transition_matrix
+            log_transition_matrix = np.log(transition_matrix)
+        else:
+            transition_matrix = None
+            log_transition_matrix = None
+
+        sparse_transition_matrix = None
+        sparse_forward_plan = None
+        transition_approximation_error = None
+        tolerance = self.sparse_transition_tolerance
+        if transition_matrix is not None and tolerance is not None:
+            # transitions below the tolerance are dropped, the error is the largest probability mass removed from a row
+            from scipy.sparse import csr_matrix
+            dropped = transition_matrix < tolerance
+            sparse_transition_matrix = csr_matrix(np.where(dropped, 0.0, transition_matrix))
+            transition_approximation_error = float(np.where(dropped, transition_matrix, 0.0).sum(axis=1).max())
+            # the forward step gathers along the columns, so it works on the rows of the transpose with reused buffers.
+            # A trailing zero keeps every row start a valid reduceat index, empty rows are zeroed after the sum.
+            # Predictions for states that lost a nonzero transition never drop below the largest mass it could have carried,
+            # while states that are unreachable in the dense matrix keep a zero prediction.
+            reachable_by_pruning = (dropped & (transition_matrix > 0)).any(axis=0)
+            transposed = sparse_transition_matrix.T.tocsr()
+            sparse_forward_plan = (
+                sparse_transition_matrix,
+                transposed.indices,
+                transposed.data,
+                np.zeros(transposed.nnz + 1),
+                transposed.indptr[:-1],
+                np.diff(transposed.indptr) == 0,
+                np.where(reachable_by_pruning, max(tolerance, np.finfo(float).tiny), 0.0),
+                np.empty(self.num_states)
+            )
+
+        observation_cache = self._build_observation_cache()
+
+        # the compiled kernels cover gaussian observations with a dense stationary transition matrix.
+        # The kernel path is switched off before the factors change and only switched on once they are in place.
+        kernel_ready = (self._kernels is not None and observation_cache["_gaussian_cholesky"] is not None
+                        and transition_matrix is not None and sparse_transition_matrix is None)
+        self._kernel_ready = False
+
+        self._log_initial_state_distribution = log_initial_state_distribution
+        self._transition_matrix = transition_matrix
+        self._log_transition_matrix = log_transition_matrix
+        for name, value in observation_cache.items():
+            setattr(self, name, value)
+        self._sparse_forward_plan = sparse_forward_plan
+        self._sparse_transition_matrix = sparse_transition_matrix
+        self.transition_approximation_error = transition_approximation_error
+
+        if kernel_ready:
+            self._kernel_log_likelihood = np.empty(self.num_states)
+            self._kernel_whitened = np.empty(self.dimensions)
+            self._kernel_alpha = np.empty(self.num_states)
+            self._kernel_ready = True
+
+        self._cache_version = version
+
+    def _build_observation_cache(self):
+
+        # the factors of the observation densities only change with the parameters, so they are
+        # derived once here instead of on every call to observations.log_likelihoods
+        cache = dict(
+            _gaussian_means=None,
+            _gaussian_cholesky=None,
+            _gaussian_inverse_cholesky=None,
+            _gaussian_log_normalizer=None,
+            _linear_log_likelihood_weights=None,
+            _linear_log_likelihood_bias=None,
+            _categorical_log_probabilities=None
+        )
+
+        if self.observation_model_type == "gaussian":
+            cholesky = np.ascontiguousarray(np.linalg.cholesky(self.observations.Sigmas))
+            log_det = np.log(np.diagonal(cholesky, axis1=-2, axis2=-1)).sum(axis=-1)
+            cache["_gaussian_means"] = np.ascontiguousarray(self.observations.mus, dtype=float)
+            cache["_gaussian_cholesky"] = cholesky
+            cache["_gaussian_inverse_cholesky"] = np.linalg.inv(cholesky)
+            cache["_gaussian_log_normalizer"] = -0.5 * self.dimensions * np.log(2 * np.pi) - log_det
+
+        # these log-likelihoods are linear in the observation, W[k] . y + b[k], up to the log y! term of the poisson
+        elif self.observation_model_type == "exponential":
+            log_lambdas = self.observations.log_lambdas
+            cache["_linear_log_likelihood_weights"] = -np.exp(log_lambdas)
+            cache["_linear_log_likelihood_bias"] = log_lambdas.sum(axis=1)
+        elif self.observation_model_type == "poisson":
+            log_lambdas = self.observations.log_lambdas
+            cache["_linear_log_likelihood_weights"] = np.array(log_lambdas, dtype=float)
+            cache["_linear_log_likelihood_bias"] = -np.exp(log_lambdas).sum(axis=1)
+        elif self.observation_model_type == "bernoulli":
+            logit_ps = self.observations.logit_ps
+            cache["_linear_log_likelihood_weights"] = np.array(logit_ps, dtype=float)
+            cache["_linear_log_likelihood_bias"] = -np.logaddexp(0, logit_ps).sum(axis=1)
+
+        elif self.observation_model_type == "categorical":
+            logits = self.observations.logits
+            cache["_categorical_log_probabilities"] = logits - logsumexp(logits, axis=-1, keepdims=True)
+
+        return cache
+
+    def _observation_log_likelihoods(self, observations):
+
+        self._refresh_cache()
+
+        if self._gaussian_inverse_cholesky is not None:
+            # one batched triangular product over all states, (T, K, D) whitened residuals
+            residuals = np.reshape(observations, (-1, 1, self.dimensions)) - self._gaussian_means
+            whitened = np.einsum("kij,tkj->tki", self._gaussian_inverse_cholesky, residuals)
+            return self._gaussian_log_normalizer - 0.5 * np.einsum("tki,tki->tk", whitened, whitened)
+
+        if self._linear_log_likelihood_weights is not None:
+            observations = np.reshape(observations, (-1, self.dimensions))
+            log_likelihoods = observations @ self._linear_log_likelihood_weights.T + self._linear_log_likelihood_bias
+            if self.observation_model_type == "poisson":
+                log_likelihoods -= gammaln(observations + 1).sum(axis=1, keepdims=True)
+            return log_likelihoods
+
+        if self._categorical_log_probabilities is not None:
+            observations = np.reshape(observations, (-1, self.dimensions)).astype(int)
+            log_probabilities = self._categorical_log_probabilities[:, np.arange(self.dimensions), observations]
+            return log_probabilities.sum(axis=-1).T
+
+        return self.observations.log_likelihoods(observations, None, None, None)
+
+    def set_sparse_transitions(self, tolerance: float = 1e-20):
+        self.sparse_transition_tolerance = tolerance
+        self.invalidate_cache()
+        self._refresh_cache()
+        return self.transition_approximation_error
+
+    def set_kernel_backend(self, backend: str = "numba"):
+        if backend not in KERNEL_BACKENDS:
+            raise ValueError(f"Unknown kernel backend: {backend}. Expected 'numpy' or 'numba'.")
+        self._kernels = get_jit_kernels() if backend == "numba" else None
+        self.kernel_backend = "numpy" if self._kernels is None else backend
+        self.invalidate_cache()
+        return self.kernel_backend
+
+    def _get_transition_matrix(self, obs):
+        self._refresh_cache()
+        if self._sparse_transition_matrix is not None:
+            return self._sparse_transition_matrix
+        if self._transition_matrix is not None:
+            return self._transition_matrix
+        return self.transitions.transition_matrices(obs, None, None, None).squeeze()
+
     def infer_state(self, observation: list[float]):
 
         observation = np.expand_dims(np.array(observation), 0)
-        self.log_alpha = self.compute_log_alpha(observation, self.log_alpha)
+        self.log_alpha, transition_matrix, log_likelihood = self._forward(observation, self.log_alpha)
+        self._decode_step(self.log_alpha, transition_matrix, log_likelihood)
         self.state_probabilities = np.exp(self.log_alpha).astype(np.double)
         prediction = self.state_probabilities.argmax()
-        self.predicted_states = np.append(self.predicted_states, prediction)
-        if self.predicted_states.shape[0] > self.buffer_count:
-            self.predicted_states = self.predicted_states[1:]
-        self.batch_observations = np.vstack([self.batch_observations, observation])
-        if self.batch_observations.shape[0] == self.buffer_count:
-            self.batch_observations = self.batch_observations[1:]
+        self._push_history(observation, prediction)
         return prediction
 
+    def infer_state_batch(self, observations: list[list[float]]):
+
+        observations = np.asarray(observations, dtype=float).reshape((-1, self.dimensions))
+        num_observations = observations.shape[0]
+
+        log_alphas = np.empty((num_observations, self.num_states))
+        if num_observations == 0:
+            return np.array([], dtype=int), log_alphas
+
+        self._refresh_cache()
+        if self._kernel_ready:
+            log_alpha = self._kernel_forward_batch(observations, log_alphas)
+        else:
+            log_likelihoods = self._observation_log_likelihoods(observations)
+
+            log_alpha = self.log_alpha
+            for t in range(num_observations):
+                if log_alpha is None:
+                    transition_matrix = None
+                    log_alpha = self._initial_log_alpha(log_likelihoods[t])
+                else:
+                    transition_matrix = self._get_transition_matrix(observations[t:t + 1])
+                    log_alpha = self._forward_step(log_alpha, transition_matrix, log_likelihoods[t])
+                self._decode_step(log_alpha, transition_matrix, log_likelihoods[t])
+                log_alphas[t] = log_alpha
+
+        self.log_alpha = log_alpha
+        state_probabilities = np.exp(log_alphas).astype(np.double)
+        self.state_probabilities = state_probabilities[-1]
+        predictions = state_probabilities.argmax(axis=1)
+
+        self._push_history(observations, predictions)
+
+        return predictions, state_probabilities
+
+    def infer_state_from_buffer(self, buffer, dtype: str = "float64"):
+        return self.infer_state(array_from_buffer(buffer, dtype, (self.dimensions,)))
+
+    def infer_state_batch_from_buffer(self, buffer, dtype: str = "float64"):
+        return self.infer_state_batch(array_from_buffer(buffer, dtype, (-1, self.dimensions)))
+
+    def get_buffer(self, name: str, dtype: str = None):
+        return array_to_buffer(getattr(self, name), dtype)
+
     def compute_log_alpha(self, obs, log_alpha=None):
+        return self._forward(obs, log_alpha)[0]
+
+    def _forward(self, obs, log_alpha):
+
+        self._refresh_cache()
+        if self._kernel_ready and np.size(obs) == self.dimensions:
+            return self._kernel_forward(obs, log_alpha)
+
+        log_likelihood = self._observation_log_likelihoods(obs).squeeze()
 
         if log_alpha is None:
-            log_alpha = (np.log(self.init_state_distn.initial_state_distn) +
-                         self.observations.log_likelihoods(obs, None, None, None)).squeeze()
-            return log_alpha - logsumexp(log_alpha)
+            return self._initial_log_alpha(log_likelihood), None, log_likelihood
 
-        m = np.max(log_alpha)
+        transition_matrix = self._get_transition_matrix(obs)
 
-        log_alpha = (np.log(np.dot(np.exp(log_alpha - m), self.transitions.transition_matrices(obs, None, None, None).squeeze())
-                            ) + m + self.observations.log_likelihoods(obs, None, None, None)).squeeze()
+        return self._forward_step(log_alpha, transition_matrix, log_likelihood), transition_matrix, log_likelihood
 
+    def _kernel_forward(self, obs, log_alpha):
+
+        log_likelihood = self._kernel_log_likelihood
+        self._kernels["gaussian_log_likelihood"](np.ascontiguousarray(obs, dtype=float).reshape(-1), self._gaussian_means,
+                                                 self._gaussian_cholesky, self._gaussian_log_normalizer, log_likelihood, self._kernel_whitened)
+
+        if log_alpha is None:
+            return self._initial_log_alpha(log_likelihood), None, log_likelihood
+
+        next_log_alpha = np.empty(self.num_states)
+        self._kernels["forward_step"](np.asarray(log_alpha, dtype=float), self._transition_matrix, log_likelihood,
+                                      next_log_alpha, self._kernel_alpha)
+        return next_log_alpha, self._transition_matrix, log_likelihood
+
+    def _kernel_forward_batch(self, observations, log_alphas):
+
+        initialized = self.log_alpha is not None
+        log_likelihoods = np.empty_like(log_alphas)
+        self._kernels["gaussian_forward_batch"](np.ascontiguousarray(observations), self._gaussian_means, self._gaussian_cholesky,
+                                                self._gaussian_log_normalizer, self._log_initial_state_distribution, self._transition_matrix,
+                                                np.asarray(self.log_alpha if initialized else log_alphas[0], dtype=float), initialized,
+                                                log_alphas, log_likelihoods, self._kernel_whitened, self._kernel_alpha)
+
+        # the decoders only consume the filtered results, so they run after the compiled forward pass
+        if self.fixed_lag is not None or self.online_viterbi:
+            for t in range(log_alphas.shape[0]):
+                transition_matrix = None if t == 0 and not initialized else self._transition_matrix
+                self._decode_step(log_alphas[t], transition_matrix, log_likelihoods[t])
+
+        return log_alphas[-1].copy()
+
+    def _initial_log_alpha(self, log_likelihood):
+
+        self._refresh_cache()
+        log_alpha = (self._log_initial_state_distribution + log_likelihood).squeeze()
+        return log_alpha - logsumexp(log_alpha)
+
+    def _forward_step(self, log_alpha, transition_matrix, log_likelihood):
+
+        # the plan is read once, a matrix from an older cache falls through to the product below, which also accepts sparse matrices
+        sparse_forward_plan = self._sparse_forward_plan
+        if sparse_forward_plan is not None and transition_matrix is sparse_forward_plan[0]:
+            return self._sparse_forward_step(log_alpha, sparse_forward_plan, log_likelihood)
+
+        m = np.max(log_alpha)
+        log_alpha = (np.log(np.exp(log_alpha - m) @ transition_matrix) + m + log_likelihood).squeeze()
         return log_alpha - logsumexp(log_alpha)
     
+    def _sparse_forward_step(self, log_alpha, sparse_forward_plan, log_likelihood):
+
+        _, columns, values, products, row_starts, empty_rows, floor, alpha = sparse_forward_plan
+        m = np.max(log_alpha)
+        np.subtract(log_alpha, m, out=alpha)
+        np.exp(alpha, out=alpha)
+
+        # the returned vector is kept by the caller and the fixed-lag window, so it is the only new allocation
+        next_log_alpha = np.empty(self.num_states)
+        np.take(alpha, columns, out=products[:-1])
+        products[:-1] *= values
+        np.add.reduceat(products, row_starts, out=next_log_alpha)
+        next_log_alpha[empty_rows] = 0.0
+        np.maximum(next_log_alpha, floor, out=next_log_alpha)
+        with np.errstate(divide="ignore"):
+            np.log(next_log_alpha, out=next_log_alpha)
+        next_log_alpha += m
+
+        np.add(next_log_alpha, np.reshape(log_likelihood, next_log_alpha.shape), out=alpha)
+        # when no state can explain the observation the prediction is kept instead of propagating NaN
+        if np.isfinite(np.max(alpha)):
+            next_log_alpha[:] = alpha
+
+        peak = np.max(next_log_alpha)
+        np.subtract(next_log_alpha, peak, out=alpha)
+        np.exp(alpha, out=alpha)
+        next_log_alpha -= peak + np.log(np.sum(alpha))
+        return next_log_alpha
+
+    def set_fixed_lag(self, lag: int = 10):
+        self.fixed_lag = lag
+        self.smoothed_state = None
+        self.smoothed_state_probabilities = None
+        self._smoothed_states.clear()
+        if lag is None:
+            self._lag_log_alphas = None
+            self._lag_transition_matrices = None
+            self._lag_log_likelihoods = None
+        else:
+            self._lag_log_alphas = deque(maxlen=lag + 1)
+            self._lag_transition_matrices = deque(maxlen=lag + 1)
+            self._lag_log_likelihoods = deque(maxlen=lag + 1)
+
+    def set_online_viterbi(self, enabled: bool = True, max_lag: int = None):
+        self.online_viterbi = enabled
+        self.viterbi_max_lag = max_lag
+        self._viterbi_delta = None
+        self._viterbi_backpointers = []
+        self._viterbi_states.clear()
+
+    def _decode_step(self, log_alpha, transition_matrix, log_likelihood):
+        if self.fixed_lag is not None:
+            self._fixed_lag_step(log_alpha, transition_matrix, log_likelihood)
+        if self.online_viterbi:
+            self._viterbi_step(log_alpha, transition_matrix, log_likelihood)
+
+    def _fixed_lag_step(self, log_alpha, transition_matrix, log_likelihood):
+
+        self._lag_log_alphas.append(log_alpha)
+        self._lag_transition_matrices.append(transition_matrix)
+        # the compiled kernels reuse their log-likelihood buffer, so the window keeps a copy
+        self._lag_log_likelihoods.append(np.array(log_likelihood, dtype=float).reshape(-1))
+
+        if len(self._lag_log_alphas) <= self.fixed_lag:
+            return
+
+        # backward recursion over the window, beta_{s-1} = P_s (p(y_s | z_s) * beta_s), normalised at every step
+        beta = np.ones(self.num_states)
+        for s in range(self.fixed_lag, 0, -1):
+            log_likelihood = self._lag_log_likelihoods[s]
+            beta = self._lag_transition_matrices[s] @ (np.exp(log_likelihood - log_likelihood.max()) * beta)
+            beta /= beta.sum()
+
+        log_posterior = self._lag_log_alphas[0] + np.log(beta)
+        self.smoothed_state_probabilities = np.exp(log_posterior - logsumexp(log_posterior))
+        self.smoothed_state = self.smoothed_state_probabilities.argmax()
+        self._smoothed_states.push(self.smoothed_state)
+
+    def _viterbi_step(self, log_alpha, transition_matrix, log_likelihood):
+
+        backpointers = self._viterbi_backpointers
+
+        if self._viterbi_delta is None or transition_matrix is None:
+            delta = np.array(log_alpha, dtype=float)
+            backpointers.clear()
+        else:
+            if self._log_transition_matrix is not None and self.transition_model_type in STATIONARY_TRANSITION_MODEL_TYPES:
+                log_transition_matrix = self._log_transition_matrix
+            else:
+                log_transition_matrix = np.log(transition_matrix)
+            scores = self._viterbi_delta[:, np.newaxis] + log_transition_matrix
+            backpointer = scores.argmax(axis=0)
+            delta = scores[backpointer, np.arange(self.num_states)] + np.reshape(log_likelihood, -1)
+            backpointers.append(backpointer)
+
+        delta -= delta.max()
+        self._viterbi_delta = delta
+
+        # backpointers[i] maps states at window step i + 1 to states at window step i. Once the
+        # paths of all states merge, everything up to the merge point is final and is emitted.
+        survivors = np.arange(self.num_states)
+        for i in range(len(backpointers) - 1, -1, -1):
+            survivors = np.unique(backpointers[i][survivors])
+            if len(survivors) == 1:
+                state = survivors[0]
+                path = [state]
+                for j in range(i - 1, -1, -1):
+                    state = backpointers[j][state]
+                    path.append(state)
+                self._viterbi_states.extend(path[::-1])
+                del backpointers[:i + 1]
+                break
+
+        # with a bounded lag the oldest pending step is decided from the current best path
+        # and the states whose paths disagree with that decision are discarded
+        while self.viterbi_max_lag is not None and len(backpointers) > self.viterbi_max_lag:
+            origins = np.arange(self.num_states)
+            for backpointer in reversed(backpointers):
+                origins = backpointer[origins]
+            state = origins[delta.argmax()]
+            self._viterbi_states.push(state)
+            delta[origins != state] = -np.inf
+            del backpointers[0]
+
+    def get_viterbi_path(self):
+        # pending part of the decoded path, from the oldest undecided step to the current one
+        if self._viterbi_delta is None:
+            return np.array([], dtype=np.int64)
+        state = self._viterbi_delta.argmax()
+        path = [state]
+        for backpointer in reversed(self._viterbi_backpointers):
+            state = backpointer[state]
+            path.append(state)
+        return np.array(path[::-1], dtype=np.int64)
+
     def save_model(self, path: str):
+        if path.endswith(".npz"):
+            return self.save_archive(path)
         with open(path, "wb") as f:
             pickle.dump(self, f)
 
     @classmethod
-    def load_model(cls, path: str):
+    def load_model(cls, path: str, mmap_mode: str = None):
+        if path.endswith(".npz"):
+            return cls.load_archive(path, mmap_mode)
         with open(path, 'rb') as f:
             return CustomUnpickler(f).load()
 
+    def save_archive(self, path: str):
+        arrays = {}
+        metadata = {
+            "schema_version": MODEL_ARCHIVE_SCHEMA_VERSION,
+            "num_states": self.num_states,
+            "dimensions": self.dimensions,
+            "observation_model_type": self.observation_model_type,
+            "transition_model_type": self.transition_model_type,
+            "params": [],
+            "observations_kwargs": _split_archive_kwargs(self.observations_kwargs, "observations_kwargs", arrays),
+            "transitions_kwargs": _split_archive_kwargs(self.transitions_kwargs, "transitions_kwargs", arrays),
+        }
+
+        for i, params in enumerate(self.params):
+            if isinstance(params, tuple):
+                metadata["params"].append(len(params))
+                for j, param in enumerate(params):
+                    arrays[f"params/{i}/{j}"] = np.asarray(param)
+            else:
+                metadata["params"].append(None)
+                arrays[f"params/{i}"] = np.asarray(params)
+
+        arrays["metadata"] = np.array(json.dumps(metadata))
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load_archive(cls, path: str, mmap_mode: str = None):
+        # pickled objects are never loaded. with mmap_mode the parameter arrays are memory-mapped
+        # instead of read, "c" maps them copy-on-write so that fitting can still update them
+        if mmap_mode not in (None, "r", "c"):
+            raise ValueError(f"Unsupported archive mmap mode: {mmap_mode}. Expected None, 'r' or 'c'.")
+        with np.load(path, allow_pickle=False) as archive:
+            metadata = json.loads(archive["metadata"].item())
+            schema_version = metadata.get("schema_version")
+            if schema_version != MODEL_ARCHIVE_SCHEMA_VERSION:
+                raise ValueError(f"Unsupported model archive schema version: {schema_version}. Expected {MODEL_ARCHIVE_SCHEMA_VERSION}.")
+            if mmap_mode is not None:
+                archive = _map_archive_members(path, archive, mmap_mode)
+
+            params = []
+            for i, length in enumerate(metadata["params"]):
+                if length is None:
+                    params.append(archive[f"params/{i}"])
+                else:
+                    params.append(tuple(archive[f"params/{i}/{j}"] for j in range(length)))
+
+            observations_kwargs = _merge_archive_kwargs(metadata["observations_kwargs"], "observations_kwargs", archive)
+            transitions_kwargs = _merge_archive_kwargs(metadata["transitions_kwargs"], "transitions_kwargs", archive)
+
+        model = cls(
+            num_states=metadata["num_states"],
+            dimensions=metadata["dimensions"],
+            observation_model_type=metadata["observation_model_type"],
+            transition_model_type=metadata["transition_model_type"],
+            observations_kwargs=observations_kwargs,
+            transitions_kwargs=transitions_kwargs,
+        )
+        model.params = tuple(params)
+        model.update_params(None, None, None)
+        return model
+
     def fit_async(self,
                   observation: list[float],
                   vars_to_estimate: dict = None,
                   batch_size: int = 20,
                   max_iter: int = 50,
-                  flush_data_between_batches: bool = False):
+                  flush_data_between_batches: bool = False,
+                  fit_method: str = "em",
+                  forgetting_rate: float = 0.6,
+                  step_size_delay: float = 1.0,
+                  backend: str = "thread"):
+
+        if fit_method not in ("em", "online_em"):
+            raise ValueError(f"Unknown fit method: {fit_method}. Expected 'em' or 'online_em'.")
+
+        if fit_method == "online_em":
+            self._check_online_em_supported()
+
+        if backend not in FIT_BACKENDS:
+            raise ValueError(f"Unknown fit backend: {backend}. Expected 'thread' or 'process'.")
+
+        if backend == "process" and fit_method == "online_em":
+            raise ValueError("Online EM updates are applied in place and only support the 'thread' backend.")
+
+        # the completion callback runs on the fit thread, so it only requests the reset and the window is modified here
+        if self._batch_reset_pending:
+            self._batch_reset_pending = False
+            self.curr_batch_size = 0
+            if self.flush_data_between_batches:
+                self.batch = None
+            else:
+                # online EM sees every row once, so the rows of the finished update leave the window
+                self._batch_window.evict(self._consumed_batch_rows)
+            self._consumed_batch_rows = 0
 
         self.flush_data_between_batches = flush_data_between_batches
 
-        if self.batch is None:
-            self.batch = np.expand_dims(np.array(observation), 0)
+        # the window appends and evicts in O(1), and the batch handed to the fitter is a view of it
+        if len(self._batch_window) == 0:
+            self._batch_window.append(observation)
             self.curr_batch_size += 1
 
         elif self.curr_batch_size < batch_size or not flush_data_between_batches:
-            self.batch = np.vstack(
-                [self.batch, np.expand_dims(np.array(observation), 0)])
+            self._batch_window.append(observation)
             self.curr_batch_size += 1
 
         elif self.curr_batch_size == batch_size:
-            self.batch = np.vstack(
-                [self.batch[1:], np.expand_dims(np.array(observation), 0)])
+            self._batch_window.evict()
+            self._batch_window.append(observation)
 
-        if not self.is_running and self.loop is None and self.thread is None:
+        scheduler = get_fit_scheduler()
+
+        if not self._fit_finished and (not self.is_running or scheduler.is_pending(self)):
 
             if self.curr_batch_size >= batch_size:
 
@@ -199,6 +1497,7 @@ class HiddenMarkovModel(HMM):
                     }
 
                 def calculate_permutation(mat1, mat2):
+                    from scipy.optimize import linear_sum_assignment
                     num_states = mat1.shape[0]
                     cost_matrix = np.zeros((num_states, num_states))
                     for i in range(num_states):
@@ -207,16 +1506,15 @@ class HiddenMarkovModel(HMM):
                                 mat1[i] - mat2[j])
                     return linear_sum_assignment(cost_matrix)[1]
 
-                def start_loop(loop):
-                    asyncio.set_event_loop(loop)
-                    loop.run_forever()
+                # without flushing, the window only grows, so the rows submitted now are its first rows
+                consumed_rows = len(self._batch_window) if fit_method == "online_em" else 0
 
                 def on_completion(future):
 
-                    if self.observation_model_type == "gaussian":
+                    if fit_method == "em" and self.observation_model_type == "gaussian":
                         permutation = calculate_permutation(
                             self.observations_params[0], self.params[2][0])
-                        super(HiddenMarkovModel, self).permute(permutation)
+                        self.permute(permutation)
 
                     initial_state_distribution = None if vars_to_estimate[
                         "initial_state_distribution"] else self.initial_state_distribution
@@ -228,33 +1526,156 @@ class HiddenMarkovModel(HMM):
                     self.update_params(initial_state_distribution,
                                        transitions_params, observations_params)
 
+                    self._consumed_batch_rows = consumed_rows
+                    self._batch_reset_pending = True
                     self.is_running = False
                     self._fit_finished = True
-                    self.curr_batch_size = 0
-
-                    if self.flush_data_between_batches:
-                        self.batch = None
 
                 self.is_running = True
 
-                if self.loop is None or self.loop.is_closed():
-                    self.loop = asyncio.new_event_loop()
+                # while the job is still queued, resubmitting replaces it with the latest batch
+                if fit_method == "online_em":
+                    scheduler.submit(self, self.fit_online_em, self.batch,
+                        forgetting_rate=forgetting_rate, step_size_delay=step_size_delay,
+                        on_completion=on_completion)
+                elif backend == "process":
+                    scheduler.submit(self, self._fit_in_process, self.batch,
+                        dict(method="em", num_iters=max_iter, init_method="kmeans"),
+                        on_completion=on_completion)
+                else:
+                    scheduler.submit(self, super(HiddenMarkovModel, self).fit, self.batch,
+                        method="em", num_iters=max_iter, init_method="kmeans",
+                        on_completion=on_completion)
+
+        return self.is_running
+
+    def _fit_in_process(self, batch, fit_kwargs):
+        model_kwargs = dict(
+            K=self.num_states,
+            D=self.dimensions,
+            observations=self.observation_model_type,
+            observation_kwargs=self.observations_kwargs,
+            transitions=self.transition_model_type,
+            transition_kwargs=self.transitions_kwargs
+        )
+        future = get_fit_worker_pool().submit("fit", model_kwargs, self.params, np.array(batch), fit_kwargs)
+        self.params = future.result()
 
-                if self.thread is None:
-                    self.thread = threading.Thread(
-                        target=start_loop, args=(self.loop,))
-                    self.thread.start()
+    def _check_online_em_supported(self):
+        if self.observation_model_type not in ONLINE_EM_OBSERVATION_MODEL_TYPES:
+            raise ValueError(f"Online EM is not supported for {self.observation_model_type} observations.")
+        if self.transition_model_type not in STATIONARY_TRANSITION_MODEL_TYPES:
+            raise ValueError(f"Online EM is not supported for {self.transition_model_type} transitions.")
 
-                future = asyncio.run_coroutine_threadsafe(self._fit_async(
-                    self.batch, method="em", num_iters=max_iter, init_method="kmeans"), self.loop)
-                future.add_done_callback(on_completion)
+    def fit_online_em(self, data, forgetting_rate: float = 0.6, step_size_delay: float = 1.0):
 
-        return self.is_running
+        self._check_online_em_supported()
+
+        data = np.array(data, dtype=float).reshape((-1, self.dimensions))
+        if data.shape[0] < 2:
+            return
+
+        if self._online_em_stats is None:
+            self._online_em_stats = self._sufficient_statistics_from_params()
+
+        expected_states, expected_joints = self._expected_states_and_joints(data)
+        window_stats = self._sufficient_statistics(data, expected_states, expected_joints)
+
+        # stochastic approximation step size, rho = (n + delay) ^ -forgetting_rate
+        self._online_em_count += 1
+        step_size = (self._online_em_count + step_size_delay) ** -forgetting_rate
+        for key, value in window_stats.items():
+            self._online_em_stats[key] = (1 - step_size) * self._online_em_stats[key] + step_size * value
+
+        self._online_m_step(self._online_em_stats)
+
+    def reset_online_em(self):
+        self._online_em_stats = None
+        self._online_em_count = 0
+
+    def _expected_states_and_joints(self, data):
+
+        log_likelihoods = self._observation_log_likelihoods(data)
+        log_pi0 = np.log(self.init_state_distn.initial_state_distn)
+        log_Ps = np.log(self.transitions.transition_matrix)
+        num_timesteps = log_likelihoods.shape[0]
+
+        log_alphas = np.empty_like(log_likelihoods)
+        log_betas = np.zeros_like(log_likelihoods)
+
+        log_alphas[0] = log_pi0 + log_likelihoods[0]
+        for t in range(1, num_timesteps):
+            log_alphas[t] = logsumexp(log_alphas[t - 1][:, None] + log_Ps, axis=0) + log_likelihoods[t]
+
+        for t in range(num_timesteps - 2, -1, -1):
+            log_betas[t] = logsumexp(log_Ps + log_likelihoods[t + 1] + log_betas[t + 1], axis=1)
+
+        log_gammas = log_alphas + log_betas
+        expected_states = np.exp(log_gammas - logsumexp(log_gammas, axis=1, keepdims=True))
+
+        log_joints = log_alphas[:-1, :, None] + log_Ps[None] + (log_likelihoods[1:] + log_betas[1:])[:, None, :]
+        expected_joints = np.exp(log_joints - logsumexp(log_joints, axis=(1, 2), keepdims=True))
+
+        return expected_states, expected_joints.sum(axis=0)
+
+    def _sufficient_statistics(self, data, expected_states, expected_joints):
+
+        num_timesteps = data.shape[0]
+        stats = {
+            "initial": expected_states[0],
+            "transitions": expected_joints / (num_timesteps - 1),
+            "weights": expected_states.sum(axis=0) / num_timesteps,
+            "sums": expected_states.T @ data / num_timesteps
+        }
+        if self.observation_model_type == "gaussian":
+            stats["outer"] = np.einsum("tk,ti,tj->kij", expected_states, data, data) / num_timesteps
+        return stats
+
+    def _sufficient_statistics_from_params(self):
+
+        weights = np.full(self.num_states, 1.0 / self.num_states)
+        stats = {
+            "initial": self.init_state_distn.initial_state_distn.copy(),
+            "transitions": self.transitions.transition_matrix * weights[:, None],
+            "weights": weights
+        }
+        if self.observation_model_type == "gaussian":
+            mus = self.observations.mus
+            stats["sums"] = weights[:, None] * mus
+            stats["outer"] = weights[:, None, None] * (self.observations.Sigmas + np.einsum("ki,kj->kij", mus, mus))
+        elif self.observation_model_type == "poisson":
+            stats["sums"] = weights[:, None] * np.exp(self.observations.log_lambdas)
+        elif self.observation_model_type == "bernoulli":
+            stats["sums"] = weights[:, None] / (1 + np.exp(-self.observations.logit_ps))
+        elif self.observation_model_type == "exponential":
+            stats["sums"] = weights[:, None] * np.exp(-self.observations.log_lambdas)
+        return stats
 
-    async def _fit_async(self, *args, **kwargs):
-        func = partial(super(HiddenMarkovModel, self).fit, *args, **kwargs)
-        with ThreadPoolExecutor() as pool:
-            await self.loop.run_in_executor(pool, func)
+    def _online_m_step(self, stats):
+
+        pi0 = stats["initial"] + 1e-8
+        self.init_state_distn.log_pi0 = np.log(pi0 / pi0.sum())
+
+        Ps = stats["transitions"] + 1e-32
+        self.transitions.log_Ps = np.log(Ps / Ps.sum(axis=1, keepdims=True))
+
+        weights = stats["weights"][:, None] + 1e-16
+        means = stats["sums"] / weights
+
+        if self.observation_model_type == "gaussian":
+            Sigmas = stats["outer"] / weights[:, :, None] - np.einsum("ki,kj->kij", means, means)
+            Sigmas = Sigmas + 1e-4 * np.eye(self.dimensions)
+            self.observations.mus = means
+            self.observations._sqrt_Sigmas = np.linalg.cholesky(Sigmas)
+        elif self.observation_model_type == "poisson":
+            self.observations.log_lambdas = np.log(means + 1e-16)
+        elif self.observation_model_type == "bernoulli":
+            means = np.clip(means, 1e-8, 1 - 1e-8)
+            self.observations.logit_ps = np.log(means / (1 - means))
+        elif self.observation_model_type == "exponential":
+            self.observations.log_lambdas = -np.log(means + 1e-16)
+
+        self.invalidate_cache()
 
     def get_fit_finished(self):
         return self._fit_finished
@@ -262,17 +1683,141 @@ class HiddenMarkovModel(HMM):
     def reset_fit_loop(self):
         self._fit_finished = False
 
-        if self.loop.is_running():
-            self.loop.call_soon_threadsafe(self.loop.stop)
+    def enable_metrics(self, enabled: bool = True):
+        set_metrics_enabled(self, INSTRUMENTED_METHODS, enabled)
+
+    def get_metrics(self):
+        return get_model_metrics(self, {
+            "buffer_count": self.buffer_count,
+            "batch_observations": len(self._batch_observations),
+            "batch": len(self._batch_window),
+            "curr_batch_size": self.curr_batch_size
+        })
+
+    def cancel_fit(self):
+        if get_fit_scheduler().cancel(self):
+            self.is_running = False
+
+class MultiStreamHiddenMarkovModel:
+
+    def __init__(self, models, num_streams: int = None):
+
+        if isinstance(models, HiddenMarkovModel):
+            models = [models]
+        else:
+            models = list(models)
+
+        if len(models) == 0:
+            raise ValueError("At least one model is required.")
+
+        num_states = models[0].num_states
+        dimensions = models[0].dimensions
+        for model in models:
+            if model.num_states != num_states or model.dimensions != dimensions:
+                raise ValueError("All models must have the same number of states and dimensions.")
+            if model.observation_model_type not in MEMORYLESS_OBSERVATION_MODEL_TYPES:
+                raise ValueError(f"Multi-stream inference is not supported for observation model type: {model.observation_model_type}.")
+            if model.transition_model_type not in STATIONARY_TRANSITION_MODEL_TYPES:
+                raise ValueError(f"Multi-stream inference is not supported for transition model type: {model.transition_model_type}.")
+
+        self.shared = len(models) == 1
+        if num_streams is None:
+            num_streams = len(models)
+        elif not self.shared and num_streams != len(models):
+            raise ValueError(f"Expected one model per stream, got {len(models)} models for {num_streams} streams.")
+
+        self.models = models
+        self.num_streams = num_streams
+        self.num_states = num_states
+        self.dimensions = dimensions
 
-        if self.thread.is_alive():
-            self.thread.join()
+        self._cache_key = None
+        self._log_initial_state_distribution = None
+        self._transition_matrix = None
+        self._gaussian_means = None
+        self._gaussian_inverse_cholesky = None
+        self._gaussian_log_normalizer = None
+
+        self.log_alpha = np.zeros((num_streams, num_states))
+        self.state_probabilities = np.full((num_streams, num_states), 1.0 / num_states)
+        self.predictions = np.zeros(num_streams, dtype=np.int64)
+        self._initialized = np.zeros(num_streams, dtype=bool)
+
+    def _refresh_cache(self):
+        cache_key = tuple(model._params_version for model in self.models)
+        if self._cache_key == cache_key:
+            return
+        self._cache_key = cache_key
+
+        for model in self.models:
+            model._refresh_cache()
+
+        if self.shared:
+            model = self.models[0]
+            self._log_initial_state_distribution = model._log_initial_state_distribution
+            self._transition_matrix = model._transition_matrix
+            return
+
+        self._log_initial_state_distribution = np.stack([model._log_initial_state_distribution for model in self.models])
+        self._transition_matrix = np.stack([model._transition_matrix for model in self.models])
+
+        if all(model._gaussian_inverse_cholesky is not None for model in self.models):
+            self._gaussian_means = np.stack([model._gaussian_means for model in self.models])
+            self._gaussian_inverse_cholesky = np.stack([model._gaussian_inverse_cholesky for model in self.models])
+            self._gaussian_log_normalizer = np.stack([model._gaussian_log_normalizer for model in self.models])
+        else:
+            self._gaussian_means = None
+            self._gaussian_inverse_cholesky = None
+            self._gaussian_log_normalizer = None
+
+    def _log_likelihoods(self, observations):
+        if self.shared:
+            return self.models[0]._observation_log_likelihoods(observations)
+
+        if self._gaussian_inverse_cholesky is not None:
+            # stacked per-stream models, evaluated as one batched triangular product over (M, K)
+            residuals = observations[:, np.newaxis, :] - self._gaussian_means
+            whitened = np.einsum("mkij,mkj->mki", self._gaussian_inverse_cholesky, residuals)
+            return self._gaussian_log_normalizer - 0.5 * np.einsum("mkd,mkd->mk", whitened, whitened)
+
+        return np.concatenate([model._observation_log_likelihoods(observations[m:m + 1])
+                               for m, model in enumerate(self.models)])
+
+    def infer_state(self, observations: list[list[float]]):
+
+        observations = np.asarray(observations, dtype=float).reshape((self.num_streams, self.dimensions))
+        self._refresh_cache()
+
+        # streams without an observation on this tick only take the prediction step
+        missing = np.isnan(observations).any(axis=1)
+        if missing.any():
+            observations = np.where(missing[:, np.newaxis], 0.0, observations)
+
+        log_likelihoods = self._log_likelihoods(observations)
+        if missing.any():
+            log_likelihoods[missing] = 0.0
+
+        m = self.log_alpha.max(axis=1, keepdims=True)
+        alpha = np.exp(self.log_alpha - m)
+        if self.shared:
+            predicted = alpha @ self._transition_matrix
+        else:
+            predicted = np.einsum("mk,mkj->mj", alpha, self._transition_matrix)
+        log_alpha = np.log(predicted) + m + log_likelihoods
 
-        self.loop.stop()
-        self.loop.close()
+        if not self._initialized.all():
+            initial = self._log_initial_state_distribution + log_likelihoods
+            log_alpha = np.where(self._initialized[:, np.newaxis], log_alpha, initial)
+            self._initialized[:] = True
 
-        del (self.thread)
-        del (self.loop)
+        self.log_alpha = log_alpha - logsumexp(log_alpha, axis=1, keepdims=True)
+        self.state_probabilities = np.exp(self.log_alpha)
+        self.predictions = self.state_probabilities.argmax(axis=1)
+        return self.predictions
 
-        self.thread = None
-        self.loop = None
+    def reset(self, streams = None):
+        if streams is None:
+            streams = slice(None)
+        self.log_alpha[streams] = 0.0
+        self.state_probabilities[streams] = 1.0 / self.num_states
+        self._initialized[streams] = False
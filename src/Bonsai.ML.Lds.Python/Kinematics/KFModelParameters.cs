@@ -38,6 +38,8 @@ namespace Bonsai.ML.Lds.Python.Kinematics
         private double _sqrt_diag_V0_value;
     
         private int _fps;
+
+        private bool _steady_state;
         private string pos_x0String;
         private string pos_y0String;
         private string vel_x0String;
@@ -49,6 +51,7 @@ namespace Bonsai.ML.Lds.Python.Kinematics
         private string sigma_yString;
         private string sqrt_diag_V0_valueString;
         private string fpsString;
+        private string steady_stateString;
 
         /// <summary>
         /// The initial x position.
@@ -248,6 +251,24 @@ namespace Bonsai.ML.Lds.Python.Kinematics
             }
         }
 
+        /// <summary>
+        /// A value indicating whether the filter switches to a constant steady-state gain once the covariance has converged.
+        /// </summary>
+        [JsonProperty("steady_state")]
+        [Description("A value indicating whether the filter switches to a constant steady-state gain once the covariance has converged.")]
+        public bool SteadyState
+        {
+            get
+            {
+                return _steady_state;
+            }
+            set
+            {
+                _steady_state = value;
+                steady_stateString = _steady_state ? "True" : "False";
+            }
+        }
+
         /// <summary>
         /// Initializes a new instance of the <see cref="KFModelParameters"/> class.
         /// </summary>
@@ -258,6 +279,7 @@ namespace Bonsai.ML.Lds.Python.Kinematics
             Sigma_y = 100;
             Sqrt_diag_V0_value = 0.001;
             Fps = 60;
+            SteadyState = false;
         }
 
         /// <summary>
@@ -277,7 +299,8 @@ namespace Bonsai.ML.Lds.Python.Kinematics
     				Sigma_x = _sigma_x,
     				Sigma_y = _sigma_y,
     				Sqrt_diag_V0_value = _sqrt_diag_V0_value,
-    				Fps = _fps
+    				Fps = _fps,
+    				SteadyState = _steady_state
     			}));
         }
 
@@ -299,6 +322,7 @@ namespace Bonsai.ML.Lds.Python.Kinematics
                 var sigma_yPyObj = pyObject.GetAttr<double>("sigma_y");
                 var sqrt_diag_V0_valuePyObj = pyObject.GetAttr<double>("sqrt_diag_V0_value");
                 var fpsPyObj = pyObject.GetAttr<int>("fps");
+                var steady_statePyObj = pyObject.GetAttr<bool>("steady_state");
 
                 return new KFModelParameters {
                     Pos_x0 = pos_x0PyObj,
@@ -311,7 +335,8 @@ namespace Bonsai.ML.Lds.Python.Kinematics
                     Sigma_x = sigma_xPyObj,
                     Sigma_y = sigma_yPyObj,
                     Sqrt_diag_V0_value = sqrt_diag_V0_valuePyObj,
-                    Fps = fpsPyObj
+                    Fps = fpsPyObj,
+                    SteadyState = steady_statePyObj
                 };
             });
         }
@@ -333,14 +358,15 @@ namespace Bonsai.ML.Lds.Python.Kinematics
                     Sigma_x = _sigma_x,
                     Sigma_y = _sigma_y,
                     Sqrt_diag_V0_value = _sqrt_diag_V0_value,
-                    Fps = _fps
+                    Fps = _fps,
+                    SteadyState = _steady_state
                 });
         }
 
         /// <inheritdoc/>
         public override string ToString()
         {
-            return $"pos_x0={pos_x0String},pos_y0={pos_y0String},vel_x0={vel_x0String},vel_y0={vel_y0String},acc_x0={acc_x0String},acc_y0={acc_y0String},sigma_a={sigma_aString},sigma_x={sigma_xString},sigma_y={sigma_yString},sqrt_diag_V0_value={sqrt_diag_V0_valueString},fps={fpsString}";
+            return $"pos_x0={pos_x0String},pos_y0={pos_y0String},vel_x0={vel_x0String},vel_y0={vel_y0String},acc_x0={acc_x0String},acc_y0={acc_y0String},sigma_a={sigma_aString},sigma_x={sigma_xString},sigma_y={sigma_yString},sqrt_diag_V0_value={sqrt_diag_V0_valueString},fps={fpsString},steady_state={steady_stateString}";
         }
     }
 
@@ -36,12 +36,23 @@ namespace Bonsai.ML.Lds.Python.LinearRegression
             return Observable.Select(source, pyObject =>
             {
                 var gridParameters = GridParameters.ConvertPyObject(pyObject);
-                var values = (double[,])pyObject.GetArrayAttr("pdf_values");
+                var values = pyObject.GetArrayAttr("pdf_values") switch
+                {
+                    float[,] singleValues => ConvertToDouble(singleValues),
+                    var doubleValues => (double[,])doubleValues
+                };
                 return new MultivariatePDF {
                     GridParameters = gridParameters,
                     Values = values
                 };
             });
         }
+
+        private static double[,] ConvertToDouble(float[,] values)
+        {
+            var result = new double[values.GetLength(0), values.GetLength(1)];
+            Array.Copy(values, result, values.Length);
+            return result;
+        }
     }
 }
\ No newline at end of file
@@ -1,13 +1,690 @@
 from lds.inference import OnlineKalmanFilter, TimeVaryingOnlineKalmanFilter
 import numpy as np
 
-import lds.learning
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 import threading
-from functools import partial
+import time
+import sys
+import os
 
-from scipy.stats import multivariate_normal
+from collections import deque
+
+OPTIMIZATION_BACKENDS = ("thread", "process")
+OPTIMIZATION_METHODS = ("scipy", "gradient")
+KERNEL_BACKENDS = ("numpy", "numba")
+# relative Frobenius distance between the filtered and steady state covariances below which the fixed gain is used
+STEADY_STATE_TOLERANCE = 1e-9
+# range of the log standard deviations searched by the gradient optimizer, which keeps the covariances finite and invertible
+GRADIENT_LOG_STD_BOUNDS = (-15.0, 15.0)
+KINEMATICS_INSTRUMENTED_METHODS = ("predict", "update", "update_from_buffer", "forecast", "run_optimization", "run_optimization_async")
+LINEAR_REGRESSION_INSTRUMENTED_METHODS = ("predict", "update", "update_batch", "update_from_buffer", "pdf")
+
+# The module is loaded by Bonsai from an embedded resource, so worker processes cannot
+# import it. The code needed by the workers is kept as source and registered as a
+# module of its own, both here and in each worker, so that its functions can be pickled.
+FIT_WORKER_MODULE_NAME = "bonsai_ml_lds_fit_worker"
+
+FIT_WORKER_SOURCE = """
+def optimize_tracking(optimization_kwargs):
+    import lds.learning
+    return lds.learning.scipy_optimize_SS_tracking_diagV0(**optimization_kwargs)["x"]
+
+def ping():
+    return True
+"""
+
+FIT_WORKER_BOOTSTRAP = """
+import sys
+import types
+if name not in sys.modules:
+    module = types.ModuleType(name)
+    exec(source, module.__dict__)
+    sys.modules[name] = module
+"""
+
+def _load_fit_worker_module():
+    exec(FIT_WORKER_BOOTSTRAP, {"name": FIT_WORKER_MODULE_NAME, "source": FIT_WORKER_SOURCE})
+    return sys.modules[FIT_WORKER_MODULE_NAME]
+
+def _get_python_executable():
+    # when python is embedded in Bonsai, sys.executable points to the host application
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    for candidate in [os.path.join(sys.prefix, "python.exe"),
+                      os.path.join(sys.prefix, "Scripts", "python.exe"),
+                      os.path.join(sys.prefix, "bin", "python3"),
+                      os.path.join(sys.prefix, "bin", "python")]:
+        if os.path.isfile(candidate):
+            return candidate
+    return sys.executable
+
+class FitWorkerPool:
+
+    def __init__(self, num_workers: int = 1):
+        self.num_workers = num_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                # only the process backend needs multiprocessing, so it is imported on first use
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                context = multiprocessing.get_context("spawn")
+                context.set_executable(_get_python_executable())
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    mp_context=context,
+                    initializer=exec,
+                    initargs=(FIT_WORKER_BOOTSTRAP, {"name": FIT_WORKER_MODULE_NAME, "source": FIT_WORKER_SOURCE})
+                )
+                worker = _load_fit_worker_module()
+                for _ in range(self.num_workers):
+                    self._executor.submit(worker.ping)
+            return self._executor
+
+    def submit(self, func_name, *args):
+        executor = self.start()
+        worker = _load_fit_worker_module()
+        return executor.submit(getattr(worker, func_name), *args)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+_fit_worker_pool = None
+
+def get_fit_worker_pool(num_workers: int = 1):
+    global _fit_worker_pool
+    if _fit_worker_pool is None:
+        _fit_worker_pool = FitWorkerPool(num_workers)
+    return _fit_worker_pool
+
+class FitJob:
+
+    def __init__(self, key, func, args, kwargs, on_completion):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_completion = on_completion
+        self.future = Future()
+        self.submitted_time = time.perf_counter()
+        self.started_time = None
+        self.finished_time = None
+
+class FitScheduler:
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._running = {}
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "dropped": 0,
+            "cancelled": 0
+        }
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._total_run_time = 0.0
+        self._max_run_time = 0.0
+
+    def submit(self, key, func, *args, on_completion=None, **kwargs):
+        job = FitJob(key, func, args, kwargs, on_completion)
+        with self._lock:
+            self._counters["submitted"] += 1
+            # only the most recent job is kept for each key, older batches are stale
+            stale_job = self._pending.pop(key, None)
+            if stale_job is not None:
+                stale_job.future.cancel()
+                self._counters["dropped"] += 1
+            self._pending[key] = job
+            self._dispatch()
+        return job.future
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def is_running(self, key):
+        with self._lock:
+            return key in self._running
+
+    def cancel(self, key):
+        # jobs that have already started cannot be interrupted and will run to completion
+        with self._lock:
+            job = self._pending.pop(key, None)
+            if job is None:
+                return False
+            job.future.cancel()
+            self._counters["cancelled"] += 1
+            return True
+
+    def _dispatch(self):
+        for key in list(self._pending.keys()):
+            if len(self._running) >= self.max_workers:
+                break
+            if key in self._running:
+                continue
+            job = self._pending.pop(key)
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            job.started_time = time.perf_counter()
+            wait_time = job.started_time - job.submitted_time
+            self._total_wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+            self._running[key] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            result = job.func(*job.args, **job.kwargs)
+        except BaseException as e:
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(result)
+
+        try:
+            if job.on_completion is not None:
+                job.on_completion(job.future)
+        finally:
+            job.finished_time = time.perf_counter()
+            run_time = job.finished_time - job.started_time
+            metrics = getattr(job.key, "_metrics", None)
+            if metrics is not None:
+                metrics.record_fit(job.started_time - job.submitted_time, run_time)
+            with self._lock:
+                del self._running[job.key]
+                self._counters["failed" if job.future.exception() is not None else "completed"] += 1
+                self._total_run_time += run_time
+                self._max_run_time = max(self._max_run_time, run_time)
+                self._dispatch()
+
+    def get_metrics(self):
+        with self._lock:
+            started = self._counters["completed"] + self._counters["failed"] + len(self._running)
+            finished = self._counters["completed"] + self._counters["failed"]
+            return {
+                **self._counters,
+                "queue_depth": len(self._pending),
+                "running": len(self._running),
+                "max_workers": self.max_workers,
+                "mean_wait_time": self._total_wait_time / started if started > 0 else 0.0,
+                "max_wait_time": self._max_wait_time,
+                "mean_run_time": self._total_run_time / finished if finished > 0 else 0.0,
+                "max_run_time": self._max_run_time
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            for job in self._pending.values():
+                job.future.cancel()
+            self._pending.clear()
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+_fit_scheduler = None
+
+def get_fit_scheduler(max_workers: int = 2):
+    global _fit_scheduler
+    if _fit_scheduler is None:
+        _fit_scheduler = FitScheduler(max_workers)
+    return _fit_scheduler
+
+class ModelMetrics:
+
+    # latencies are counted in power-of-two microsecond buckets, an HDR-style histogram with one significant bit
+    NUM_BUCKETS = 40
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._fit_count = 0
+        self._fit_total_time = 0.0
+        self._fit_max_time = 0.0
+        self._fit_last_time = 0.0
+        self._fit_total_wait_time = 0.0
+        self._fit_max_wait_time = 0.0
+
+    def record_call(self, name, elapsed_ns):
+        entry = self._calls.get(name)
+        if entry is None:
+            entry = self._calls[name] = [0, 0, 0, [0] * self.NUM_BUCKETS]
+        entry[0] += 1
+        entry[1] += elapsed_ns
+        if elapsed_ns > entry[2]:
+            entry[2] = elapsed_ns
+        entry[3][min((elapsed_ns // 1000).bit_length(), self.NUM_BUCKETS - 1)] += 1
+
+    def record_fit(self, wait_time, run_time):
+        with self._lock:
+            self._fit_count += 1
+            self._fit_total_time += run_time
+            self._fit_max_time = max(self._fit_max_time, run_time)
+            self._fit_last_time = run_time
+            self._fit_total_wait_time += wait_time
+            self._fit_max_wait_time = max(self._fit_max_wait_time, wait_time)
+
+    @staticmethod
+    def _percentile(histogram, count, q):
+        # upper bound of the bucket holding the q-th quantile
+        target = q * count
+        cumulative = 0
+        for bucket, bucket_count in enumerate(histogram):
+            cumulative += bucket_count
+            if cumulative >= target and bucket_count > 0:
+                return float(2 ** bucket)
+        return 0.0
+
+    def snapshot(self):
+        calls = {}
+        for name, (count, total_ns, max_ns, histogram) in list(self._calls.items()):
+            histogram = list(histogram)
+            calls[name] = {
+                "count": count,
+                "total_time": total_ns / 1e9,
+                "mean_us": total_ns / count / 1e3 if count > 0 else 0.0,
+                "max_us": max_ns / 1e3,
+                "p50_us": self._percentile(histogram, count, 0.5),
+                "p99_us": self._percentile(histogram, count, 0.99),
+                "histogram": [[float(2 ** bucket), bucket_count] for bucket, bucket_count in enumerate(histogram) if bucket_count > 0]
+            }
+        with self._lock:
+            fits = {
+                "count": self._fit_count,
+                "mean_time": self._fit_total_time / self._fit_count if self._fit_count > 0 else 0.0,
+                "max_time": self._fit_max_time,
+                "last_time": self._fit_last_time,
+                "mean_wait_time": self._fit_total_wait_time / self._fit_count if self._fit_count > 0 else 0.0,
+                "max_wait_time": self._fit_max_wait_time
+            }
+        return {"calls": calls, "fits": fits}
+
+def _timed_method(metrics, name, method):
+    perf_counter_ns = time.perf_counter_ns
+    def timed(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.record_call(name, perf_counter_ns() - start)
+    return timed
+
+def set_metrics_enabled(model, method_names, enabled):
+    # instrumented methods are bound on the instance and removed again when disabled,
+    # so that a model without metrics runs the plain class methods with no extra checks
+    for name in method_names:
+        model.__dict__.pop(name, None)
+    if enabled:
+        if model._metrics is None:
+            model._metrics = ModelMetrics()
+        for name in method_names:
+            setattr(model, name, _timed_method(model._metrics, name, getattr(model, name)))
+    else:
+        model._metrics = None
+
+def get_model_metrics(model, buffers):
+    metrics = {"enabled": model._metrics is not None, "buffers": buffers, "scheduler": get_fit_scheduler().get_metrics()}
+    if model._metrics is not None:
+        metrics.update(model._metrics.snapshot())
+    return metrics
+
+BUFFER_DTYPES = ("float32", "float64", "int32", "int64")
+
+def array_from_buffer(buffer, dtype = "float64", shape = None):
+    # wraps bytes, bytearray, memoryview or ndarray data without copying whenever the dtype already matches
+    if dtype not in BUFFER_DTYPES:
+        raise ValueError(f"Unsupported buffer dtype: {dtype}. Expected one of {BUFFER_DTYPES}.")
+    if isinstance(buffer, np.ndarray):
+        array = np.asarray(buffer, dtype=dtype)
+    else:
+        array = np.frombuffer(buffer, dtype=dtype)
+    if shape is not None:
+        array = array.reshape(shape)
+    return array
+
+def array_to_buffer(array, dtype = None):
+    array = np.ascontiguousarray(array, dtype=dtype)
+    return array.dtype.name, array.shape, memoryview(array)
+
+class BatchWindow:
+
+    def __init__(self, shape: tuple = (), dtype=float, capacity: int = 16):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._data = np.empty((max(int(capacity), 1),) + self.shape, dtype=self.dtype)
+        self._start = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        end = self._start + self._count
+        if end == len(self._data):
+            # storage is replaced rather than compacted in place, so views handed out earlier keep their contents
+            data = np.empty((max(2 * self._count, 16),) + self.shape, dtype=self.dtype)
+            data[:self._count] = self.view()
+            self._data = data
+            self._start = 0
+            end = self._count
+        self._data[end] = value
+        self._count += 1
+
+    def extend(self, values):
+        for value in np.asarray(values, dtype=self.dtype).reshape((-1,) + self.shape):
+            self.append(value)
+
+    def evict(self, count: int = 1):
+        count = min(count, self._count)
+        self._start += count
+        self._count -= count
+
+    def view(self):
+        return self._data[self._start:self._start + self._count]
+
+    def clear(self):
+        self.evict(self._count)
+
+def kalman_filter_batch(Y, B, Q, Z, R, x0, P0, store_covariances = True):
+
+    # Z is either a single observation matrix or one observation matrix per timestep
+    Y = np.asarray(Y, dtype=np.double)
+    Y = Y.reshape((Y.shape[0], -1))
+    Z = np.asarray(Z, dtype=np.double)
+    time_varying_Z = Z.ndim == 3
+
+    num_timesteps = Y.shape[0]
+    n = B.shape[0]
+
+    predicted_means = np.empty((num_timesteps, n))
+    filtered_means = np.empty((num_timesteps, n))
+    predicted_covariances = np.empty((num_timesteps, n, n)) if store_covariances else None
+    filtered_covariances = np.empty((num_timesteps, n, n)) if store_covariances else None
+
+    x = np.asarray(x0, dtype=np.double).reshape(n)
+    P = np.asarray(P0, dtype=np.double)
+    BT = B.T
+
+    for t in range(num_timesteps):
+        x = B @ x
+        P = B @ P @ BT + Q
+
+        predicted_means[t] = x
+        if store_covariances:
+            predicted_covariances[t] = P
+
+        y = Y[t]
+        Z_t = Z[t] if time_varying_Z else Z
+
+        # like the online filter, rows with any missing component only take the prediction step
+        if not np.isnan(y).any():
+            PZT = P @ Z_t.T
+            S = Z_t @ PZT + R
+            K = np.linalg.solve(S, PZT.T).T
+            x = x + K @ (y - Z_t @ x)
+            P = P - K @ S @ K.T
+
+        filtered_means[t] = x
+        if store_covariances:
+            filtered_covariances[t] = P
+
+    return predicted_means, predicted_covariances, filtered_means, filtered_covariances
+
+def rts_smooth_batch(B, predicted_means, predicted_covariances, filtered_means, filtered_covariances):
+
+    smoothed_means = np.empty_like(filtered_means)
+    smoothed_covariances = np.empty_like(filtered_covariances)
+
+    smoothed_means[-1] = filtered_means[-1]
+    smoothed_covariances[-1] = filtered_covariances[-1]
+
+    for t in range(filtered_means.shape[0] - 2, -1, -1):
+        # J = V_t|t B' V_t+1|t^-1, computed with a solve since V_t+1|t is symmetric
+        J = np.linalg.solve(predicted_covariances[t + 1], B @ filtered_covariances[t]).T
+        smoothed_means[t] = filtered_means[t] + J @ (smoothed_means[t + 1] - predicted_means[t + 1])
+        smoothed_covariances[t] = filtered_covariances[t] + J @ (smoothed_covariances[t + 1] - predicted_covariances[t + 1]) @ J.T
+
+    return smoothed_means, smoothed_covariances
+
+def kalman_log_likelihood_gradient(Y, B, Z, Q, R, x0, P0, dQ, dR, dx0, dP0):
+
+    # log-likelihood of the innovations and its gradient with respect to p parameters, obtained by
+    # propagating the derivatives of the filter recursions (dx: (p, n), dP: (p, n, n)) alongside it.
+    # As in kalman_filter_batch, x0 and P0 are the prior before the first prediction step.
+    Y = np.asarray(Y, dtype=np.double)
+    Y = Y.reshape((Y.shape[0], -1))
+
+    x = np.asarray(x0, dtype=np.double).reshape(-1)
+    P = np.asarray(P0, dtype=np.double)
+    dx = np.asarray(dx0, dtype=np.double)
+    dP = np.asarray(dP0, dtype=np.double)
+    BT = B.T
+
+    log_likelihood = 0.0
+    gradient = np.zeros(dx.shape[0])
+
+    for t in range(Y.shape[0]):
+        x = B @ x
+        P = B @ P @ BT + Q
+        dx = dx @ BT
+        dP = B @ dP @ BT + dQ
+
+        # like kalman_filter_batch, rows with any missing component only take the prediction step
+        y = Y[t]
+        if np.isnan(y).any():
+            continue
+
+        PZT = P @ Z.T
+        S = Z @ PZT + R
+        S_inv = np.linalg.inv(S)
+        e = y - Z @ x
+        S_inv_e = S_inv @ e
+        K = PZT @ S_inv
+
+        de = -dx @ Z.T
+        dS = Z @ dP @ Z.T + dR
+
+        _, log_det_S = np.linalg.slogdet(S)
+        log_likelihood -= 0.5 * (log_det_S + e @ S_inv_e + len(y) * np.log(2 * np.pi))
+        gradient -= 0.5 * (np.einsum("ij,pji->p", S_inv, dS) + 2 * de @ S_inv_e - np.einsum("i,pij,j->p", S_inv_e, dS, S_inv_e))
+
+        dK = (dP @ Z.T - K @ dS) @ S_inv
+        dx = dx + dK @ e + de @ K.T
+        dKSKT = dK @ PZT.T
+        dP = dP - dKSKT - K @ dS @ K.T - dKSKT.transpose(0, 2, 1)
+        x = x + K @ e
+        P = P - K @ PZT.T
+
+    return log_likelihood, gradient
+
+def lbfgs_minimize(fun, x, memory, max_iter = 50, time_budget = None, gtol = 1e-5, lower = -np.inf, upper = np.inf):
+
+    # limited-memory BFGS with a backtracking line search. The (s, y) pairs in memory are kept
+    # by the caller, so that a following call on a similar objective starts with curvature information.
+    # Iterates are projected onto the box [lower, upper], and components held at a bound are not moved.
+    start = time.perf_counter()
+    x = np.clip(x, lower, upper)
+    f, g = fun(x)
+
+    for _ in range(max_iter):
+        free = ~(((x <= lower) & (g > 0)) | ((x >= upper) & (g < 0)))
+        if np.max(np.abs(g[free]), initial=0.0) < gtol:
+            break
+        if time_budget is not None and time.perf_counter() - start > time_budget:
+            break
+
+        q = g.copy()
+        alphas = []
+        for s, y, rho in reversed(memory):
+            alpha = rho * (s @ q)
+            alphas.append(alpha)
+            q -= alpha * y
+        if len(memory) > 0:
+            s, y, _ = memory[-1]
+            q *= (s @ y) / (y @ y)
+        else:
+            q /= max(1.0, np.linalg.norm(q))
+        for (s, y, rho), alpha in zip(memory, reversed(alphas)):
+            q += s * (alpha - rho * (y @ q))
+        direction = -q
+        direction[~free] = 0.0
+
+        if g @ direction >= 0:
+            memory.clear()
+            direction = np.where(free, -g, 0.0) / max(1.0, np.linalg.norm(g[free]))
+
+        step = 1.0
+        while True:
+            x_new = np.clip(x + step * direction, lower, upper)
+            s = x_new - x
+            if not s.any():
+                return x, f
+            f_new, g_new = fun(x_new)
+            if np.isfinite(f_new) and f_new <= f + 1e-4 * (g @ s):
+                break
+            step *= 0.5
+            if step < 1e-10:
+                return x, f
+
+        y = g_new - g
+        if s @ y > 1e-10:
+            memory.append((s, y, 1.0 / (s @ y)))
+        x, f, g = x_new, f_new, g_new
+
+    return x, f
+
+def _build_kernels(jit):
+
+    # scalar loops over preallocated arrays, compiled with numba they avoid the temporaries
+    # and call overhead of the equivalent numpy expressions for the 6-state kinematics model
+
+    @jit
+    def kalman_predict(x, P, B, Q, vector, matrix):
+        # x <- B x and P <- B P B' + Q, in place
+        n = x.shape[0]
+        for i in range(n):
+            value = 0.0
+            for k in range(n):
+                value += B[i, k] * x[k, 0]
+            vector[i] = value
+        for i in range(n):
+            x[i, 0] = vector[i]
+        for i in range(n):
+            for j in range(n):
+                value = 0.0
+                for k in range(n):
+                    value += B[i, k] * P[k, j]
+                matrix[i, j] = value
+        for i in range(n):
+            for j in range(n):
+                value = Q[i, j]
+                for k in range(n):
+                    value += matrix[i, k] * B[j, k]
+                P[i, j] = value
+
+    @jit
+    def kalman_update_2d(x, P, y, Z, R, gain, matrix):
+        # x <- x + K (y - Z x) and P <- P - K Z P with K = P Z' S^-1, in place, for two-dimensional observations
+        n = x.shape[0]
+        for a in range(2):
+            for j in range(n):
+                value = 0.0
+                for k in range(n):
+                    value += Z[a, k] * P[k, j]
+                matrix[a, j] = value
+        for i in range(n):
+            for a in range(2):
+                value = 0.0
+                for k in range(n):
+                    value += P[i, k] * Z[a, k]
+                gain[i, a] = value
+
+        s00 = R[0, 0]
+        s01 = R[0, 1]
+        s10 = R[1, 0]
+        s11 = R[1, 1]
+        for k in range(n):
+            s00 += matrix[0, k] * Z[0, k]
+            s01 += matrix[0, k] * Z[1, k]
+            s10 += matrix[1, k] * Z[0, k]
+            s11 += matrix[1, k] * Z[1, k]
+        det = s00 * s11 - s01 * s10
+        i00 = s11 / det
+        i01 = -s01 / det
+        i10 = -s10 / det
+        i11 = s00 / det
+
+        r0 = y[0]
+        r1 = y[1]
+        for k in range(n):
+            r0 -= Z[0, k] * x[k, 0]
+            r1 -= Z[1, k] * x[k, 0]
+
+        for i in range(n):
+            k0 = gain[i, 0] * i00 + gain[i, 1] * i10
+            k1 = gain[i, 0] * i01 + gain[i, 1] * i11
+            gain[i, 0] = k0
+            gain[i, 1] = k1
+            x[i, 0] += k0 * r0 + k1 * r1
+        for i in range(n):
+            for j in range(n):
+                P[i, j] -= gain[i, 0] * matrix[0, j] + gain[i, 1] * matrix[1, j]
+
+    return {
+        "kalman_predict": kalman_predict,
+        "kalman_update_2d": kalman_update_2d,
+    }
+
+_jit_kernels = None
+
+def get_jit_kernels():
+    # numba is optional and slow to import, so it is only loaded when a model selects it.
+    # None is returned when it is not installed and models keep using numpy.
+    global _jit_kernels
+    if _jit_kernels is None:
+        try:
+            import numba
+        except ImportError:
+            _jit_kernels = False
+        else:
+            _jit_kernels = _build_kernels(numba.njit)
+    return _jit_kernels or None
+
+def kinematics_matrices(dt):
+
+    B = np.array([  [1,     dt,     0.5*dt**2,  0,      0,      0],
+                    [0,     1,      dt,         0,      0,      0],
+                    [0,     0,      1,          0,      0,      0],
+                    [0,     0,      0,          1,      dt,     0.5*dt**2],
+                    [0,     0,      0,          0,      1,      dt],
+                    [0,     0,      0,          0,      0,      1]],
+                  dtype=np.double)
+
+    Z = np.array([  [1, 0, 0, 0, 0, 0],
+                    [0, 0, 0, 1, 0, 0]],
+                  dtype=np.double)
+
+    Qe = np.array([ [dt**4/4,   dt**3/2,    dt**2/2,    0,          0,          0],
+                    [dt**3/2,   dt**2,      dt,         0,          0,          0],
+                    [dt**2/2,   dt,         1,          0,          0,          0],
+                    [0,         0,          0,          dt**4/4,    dt**3/2,    dt**2/2],
+                    [0,         0,          0,          dt**3/2,    dt**2,      dt],
+                    [0,         0,          0,          dt**2/2,    dt,         1]],
+                   dtype=np.double)
+
+    return B, Z, Qe
 
 class KalmanFilterKinematics(OnlineKalmanFilter):
 
@@ -22,7 +699,8 @@ class KalmanFilterKinematics(OnlineKalmanFilter):
                     sigma_x: float,
                     sigma_y: float,
                     sqrt_diag_V0_value: float,
-                    fps: int
+                    fps: int,
+                    steady_state: bool = False
                     ) -> None:
         
         self.pos_x0=pos_x0
@@ -36,6 +714,7 @@ class KalmanFilterKinematics(OnlineKalmanFilter):
         self.sigma_y=sigma_y
         self.sqrt_diag_V0_value=sqrt_diag_V0_value
         self.fps=fps
+        self.steady_state=steady_state
 
         if np.isnan(self.pos_x0):
             self.pos_x0 = 0
@@ -45,40 +724,111 @@ class KalmanFilterKinematics(OnlineKalmanFilter):
 
         self.dt = 1.0 / self.fps
 
-        B = np.array([  [1,     self.dt,    0.5*self.dt**2, 0,      0,          0],
-                        [0,     1,          self.dt,        0,      0,          0],
-                        [0,     0,          1,              0,      0,          0],
-                        [0,     0,          0,              1,      self.dt,    0.5*self.dt**2],
-                        [0,     0,          0,              0,      1,          self.dt],
-                        [0,     0,          0,              0,      0,          1]],
-                      dtype=np.double)
-        
-        Z = np.array([  [1, 0, 0, 0, 0, 0],
-                        [0, 0, 0, 1, 0, 0]],
-
-                      dtype=np.double)
-
-        self.Qe = np.array([    [self.dt**4/4,  self.dt**3/2,   self.dt**2/2,   0,              0,              0],
-                                [self.dt**3/2,  self.dt**2,     self.dt,        0,              0,              0],
-                                [self.dt**2/2,  self.dt,        1,              0,              0,              0],
-                                [0,             0,              0,              self.dt**4/4,   self.dt**3/2,   self.dt**2/2],
-                                [0,             0,              0,              self.dt**3/2,   self.dt**2,     self.dt],
-                                [0,             0,              0,              self.dt**2/2,   self.dt,        1]],
-                                dtype=np.double)
+        B, Z, self.Qe = kinematics_matrices(self.dt)
 
         R = np.diag([self.sigma_x**2, self.sigma_y**2]).astype(np.double)
         m0 = np.array([[self.pos_x0, self.vel_x0, self.acc_x0, self.pos_y0, self.vel_y0, self.acc_y0]], dtype=np.double).T
         V0 = np.diag(np.ones(len(m0))*self.sqrt_diag_V0_value**2).astype(np.double)
         Q = self.Qe * self.sigma_a
 
-        self.batch = None
+        self._batch_window = BatchWindow(shape=(2,), dtype=np.double)
         self.is_running = False
         self._optimization_finished = False
-        self.loop = None
-        self.thread = None
+        self._batch_reset_pending = False
+        self._forecast_cache_key = None
+        self._forecast_cache = None
+        self._gradient_optimizer_state = None
+        self._metrics = None
+        self.kernel_backend = "numpy"
+        self._kernels = None
+        self._kernel_x = None
+        self._kernel_P = None
+        self._kernel_vector = np.empty(6)
+        self._kernel_gain = np.empty((6, 2))
+        self._kernel_matrix = np.empty((6, 6))
+
+        self._steady_state_gain = None
+        self._steady_state_predicted_P = None
+        self._steady_state_filtered_P = None
+        self._on_steady_state = False
 
         super().__init__(B, Q, m0, V0, Z, R)
 
+        if self.steady_state:
+            self.compute_steady_state()
+
+    @property
+    def batch(self):
+        if len(self._batch_window) == 0:
+            return None
+        return self._batch_window.view()
+
+    @batch.setter
+    def batch(self, value):
+        self._batch_window.clear()
+        if value is not None:
+            self._batch_window.extend(value)
+
+    def compute_steady_state(self):
+
+        # the predicted covariance at convergence solves the discrete algebraic Riccati equation
+        from scipy.linalg import solve_discrete_are
+        try:
+            P = solve_discrete_are(self.B.T, self.Z.T, self.Q, self.R)
+        except (np.linalg.LinAlgError, ValueError):
+            self._steady_state_gain = None
+            self._on_steady_state = False
+            return False
+
+        # the solver leaves round-off in entries the recursion keeps exactly symmetric
+        P = 0.5 * (P + P.T)
+        S = self.Z @ P @ self.Z.T + self.R
+        K = np.linalg.solve(S, self.Z @ P).T
+
+        self._steady_state_predicted_P = P
+        self._steady_state_filtered_P = P - K @ S @ K.T
+        self._steady_state_gain = K
+        self._on_steady_state = False
+        return True
+
+    def set_steady_state(self, enabled = True):
+        self.steady_state = enabled
+        if enabled:
+            self.compute_steady_state()
+        else:
+            self._on_steady_state = False
+
+    def set_kernel_backend(self, backend = "numba"):
+        if backend not in KERNEL_BACKENDS:
+            raise ValueError(f"Unknown kernel backend: {backend}. Expected 'numpy' or 'numba'.")
+        self._kernels = get_jit_kernels() if backend == "numba" else None
+        self.kernel_backend = "numpy" if self._kernels is None else backend
+        return self.kernel_backend
+
+    def _own_state(self):
+        # the kernels write x and P in place, so they get private copies the first time
+        # instead of modifying arrays shared with m0, V0 or the steady state covariances
+        if self.x is not self._kernel_x:
+            self._kernel_x = np.array(self.x, dtype=np.double, order="C").reshape((-1, 1))
+            self.x = self._kernel_x
+        if self.P is not self._kernel_P:
+            self._kernel_P = np.array(self.P, dtype=np.double, order="C")
+            self.P = self._kernel_P
+
+    def predict(self):
+
+        if self.steady_state and self._on_steady_state:
+            self.x = self.B @ self.x
+            self.P = self._steady_state_predicted_P
+            return
+
+        if self._kernels is not None:
+            self._own_state()
+            self._kernels["kalman_predict"](self.x, self.P, self.B, self.Q, self._kernel_vector, self._kernel_matrix)
+            return self.x, self.P
+
+        return super().predict()
+
     def update(self, x, y):
 
         if x is None:
@@ -86,32 +836,196 @@ class KalmanFilterKinematics(OnlineKalmanFilter):
         if y is None:
             y = np.nan
 
-        return super().update(y=np.array([x, y]))
+        y = np.array([x, y], dtype=np.double)
+
+        if self._kernels is not None and not self.steady_state:
+            if not np.isnan(y).any():
+                self._own_state()
+                self._kernels["kalman_update_2d"](self.x, self.P, y, self.Z, self.R, self._kernel_gain, self._kernel_matrix)
+            return self.x, self.P
+
+        if self.steady_state and self._steady_state_gain is not None:
+
+            if np.isnan(y).any():
+                # missing observations move the covariance away from steady state
+                self._on_steady_state = False
+
+            elif self._on_steady_state:
+                self.x = self.x + self._steady_state_gain @ (y[:, np.newaxis] - self.Z @ self.x)
+                self.P = self._steady_state_filtered_P
+                return
+
+            else:
+                result = super().update(y=y)
+                # scale-aware, since the solver leaves round-off in entries the recursion keeps at exactly zero
+                self._on_steady_state = (np.linalg.norm(self.P - self._steady_state_filtered_P)
+                                         <= STEADY_STATE_TOLERANCE * np.linalg.norm(self._steady_state_filtered_P))
+                return result
+
+        return super().update(y=y)
     
-    def forecast(self, timesteps = 1):
+    def update_from_buffer(self, buffer, dtype = "float64"):
+        observation = array_from_buffer(buffer, dtype, (2,))
+        return self.update(observation[0], observation[1])
 
-        assert timesteps > 0
+    def get_buffer(self, name, dtype = None):
+        return array_to_buffer(getattr(self, name), dtype)
 
-        x = self.x.copy()
-        P = self.P.copy()
+    def filter_batch(self, Y, x0 = None, P0 = None):
 
-        forecast_x = [x]
-        forecast_P = [P]
-        forecast_dt = [0]
+        x0 = self.x if x0 is None else x0
+        P0 = self.P if P0 is None else P0
+        _, _, means, covariances = kalman_filter_batch(Y, self.B, self.Q, self.Z, self.R, x0, P0)
+        return means, covariances
 
-        for i in range(timesteps):
-            self.predict()
-            self.update(x = np.nan, y = np.nan)
-            forecast_x.append(self.x)
-            forecast_P.append(self.P)
-            forecast_dt.append(self.dt * (i + 1))
+    def smooth_batch(self, Y, x0 = None, P0 = None):
 
-        self.x = x
-        self.P = P
+        x0 = self.x if x0 is None else x0
+        P0 = self.P if P0 is None else P0
+        filtered = kalman_filter_batch(Y, self.B, self.Q, self.Z, self.R, x0, P0)
+        return rts_smooth_batch(self.B, *filtered)
+
+    def forecast(self, timesteps = 1, stacked = False):
+
+        forecast_x, forecast_P, forecast_dt = self.forecast_stacked(timesteps)
+
+        if stacked:
+            return forecast_x, forecast_P, forecast_dt
+
+        return list(forecast_x), list(forecast_P), forecast_dt.tolist()
+
+    def forecast_stacked(self, timesteps = 1):
+
+        assert timesteps > 0
+
+        B_powers, Q_accumulated = self._forecast_propagators(timesteps)
+
+        forecast_x = B_powers @ self.x
+        forecast_P = B_powers @ self.P @ B_powers.transpose(0, 2, 1) + Q_accumulated
+        forecast_dt = self.dt * np.arange(timesteps + 1)
 
         return forecast_x, forecast_P, forecast_dt
 
+    def _forecast_propagators(self, timesteps):
+
+        # B^h and sum_{j<h} B^j Q B^j' only depend on the horizon, B and Q, so they are reused across calls
+        key = (timesteps, self.B.tobytes(), self.Q.tobytes())
+        if self._forecast_cache_key == key:
+            return self._forecast_cache
+
+        n = self.B.shape[0]
+        B_powers = np.empty((timesteps + 1, n, n))
+        Q_accumulated = np.empty((timesteps + 1, n, n))
+        B_powers[0] = np.eye(n)
+        Q_accumulated[0] = 0
+        for h in range(1, timesteps + 1):
+            B_powers[h] = self.B @ B_powers[h - 1]
+            Q_accumulated[h] = self.B @ Q_accumulated[h - 1] @ self.B.T + self.Q
+
+        self._forecast_cache_key = key
+        self._forecast_cache = (B_powers, Q_accumulated)
+        return self._forecast_cache
+
     def optimize(self, vars_to_estimate, max_iter, disp):
+        import lds.learning
+        optim_res_ga = lds.learning.scipy_optimize_SS_tracking_diagV0(**self._optimization_kwargs(max_iter, disp))
+        self._apply_optimization_result(optim_res_ga["x"], vars_to_estimate)
+
+    def optimize_gradient(self, vars_to_estimate, max_iter = 50, time_budget = None, warm_start = True):
+
+        # parameters are optimised on a log scale for the standard deviations
+        names = [name for name in ("sigma_a", "R", "m0", "V0") if vars_to_estimate.get(name, False)]
+        if len(names) == 0:
+            return
+
+        sigma_ax = np.sqrt(self.sigma_a)
+        m0 = self.m0.reshape(-1).astype(np.double)
+        n = len(m0)
+        initial = {
+            "sigma_a": np.log([sigma_ax]),
+            "R": np.log([self.sigma_x, self.sigma_y]),
+            "m0": m0,
+            "V0": np.log([self.sqrt_diag_V0_value]),
+        }
+        sizes = [len(initial[name]) for name in names]
+        offsets = np.cumsum([0] + sizes)
+        theta0 = np.concatenate([initial[name] for name in names])
+        # the means are unbounded, the log standard deviations are kept where exp() stays finite and positive
+        lower = np.concatenate([np.full(size, -np.inf if name == "m0" else GRADIENT_LOG_STD_BOUNDS[0]) for name, size in zip(names, sizes)])
+        upper = np.concatenate([np.full(size, np.inf if name == "m0" else GRADIENT_LOG_STD_BOUNDS[1]) for name, size in zip(names, sizes)])
+        Y = self.batch.astype(np.double)
+
+        def unpack(theta):
+            values = dict(initial)
+            for name, offset, size in zip(names, offsets, sizes):
+                values[name] = theta[offset:offset + size]
+            return values
+
+        def objective(theta):
+            values = unpack(theta)
+            with np.errstate(over="ignore", invalid="ignore"):
+                sigma_ax = np.exp(values["sigma_a"][0])
+                sqrt_diag_R = np.exp(values["R"])
+                sqrt_diag_V0 = np.exp(values["V0"][0])
+
+                Q = self.Qe * sigma_ax**2
+                R = np.diag(sqrt_diag_R**2)
+                P0 = np.eye(n) * sqrt_diag_V0**2
+
+            p = len(theta)
+            dQ = np.zeros((p, n, n))
+            dR = np.zeros((p, 2, 2))
+            dx0 = np.zeros((p, n))
+            dP0 = np.zeros((p, n, n))
+            for name, offset in zip(names, offsets):
+                if name == "sigma_a":
+                    dQ[offset] = 2 * Q
+                elif name == "R":
+                    dR[offset, 0, 0] = 2 * R[0, 0]
+                    dR[offset + 1, 1, 1] = 2 * R[1, 1]
+                elif name == "m0":
+                    dx0[offset:offset + n] = np.eye(n)
+                elif name == "V0":
+                    dP0[offset] = 2 * P0
+
+            # trial steps of the line search may leave the valid range, they are rejected through a non-finite value
+            with np.errstate(all="ignore"):
+                log_likelihood, gradient = kalman_log_likelihood_gradient(Y, self.B, self.Z, Q, R, values["m0"], P0, dQ, dR, dx0, dP0)
+            if not np.isfinite(log_likelihood) or not np.isfinite(gradient).all():
+                return np.inf, gradient
+            return -log_likelihood, -gradient
+
+        if warm_start and self._gradient_optimizer_state is not None and self._gradient_optimizer_state[0] == names:
+            memory = self._gradient_optimizer_state[1]
+        else:
+            memory = deque(maxlen=10)
+
+        theta, f = lbfgs_minimize(objective, theta0, memory, max_iter=max_iter, time_budget=time_budget, lower=lower, upper=upper)
+
+        values = unpack(theta)
+        x = {
+            "sigma_ax": np.exp(values["sigma_a"]),
+            "sqrt_diag_R": np.exp(values["R"]),
+            "m0": values["m0"],
+            "sqrt_diag_V0": np.exp(values["V0"]) * np.ones(n),
+        }
+
+        # a batch the filter cannot evaluate leaves the model unchanged and discards the curvature memory
+        standard_deviations = np.concatenate([x["sigma_ax"], x["sqrt_diag_R"], x["sqrt_diag_V0"]])
+        if (not np.isfinite(f) or not np.isfinite(x["m0"]).all()
+                or not np.isfinite(standard_deviations ** 2).all() or not (standard_deviations > 0).all()):
+            self._gradient_optimizer_state = None
+            return
+
+        self._gradient_optimizer_state = (names, memory)
+        self._apply_optimization_result(x, {
+            "sigma_a": "sigma_a" in names,
+            "R": "R" in names,
+            "m0": "m0" in names,
+            "V0": "V0" in names,
+        })
+
+    def _optimization_kwargs(self, max_iter, disp):
         sqrt_diag_R = np.array([self.sigma_x, self.sigma_y])
         m0 = self.m0.squeeze().copy()
         sqrt_diag_V0 = (np.ones(len(self.m0))*self.sqrt_diag_V0_value)
@@ -123,39 +1037,46 @@ class KalmanFilterKinematics(OnlineKalmanFilter):
 
         sigma_ax0 = sigma_ay0 = np.sqrt(self.sigma_a)
 
-        optim_res_ga = lds.learning.scipy_optimize_SS_tracking_diagV0(y=y, B=B, sigma_ax0=sigma_ax0, sigma_ay0=sigma_ay0, Qe=Qe, Z=Z, sqrt_diag_R_0=sqrt_diag_R, m0_0=m0, sqrt_diag_V0_0=sqrt_diag_V0, max_iter=max_iter, disp=disp)
+        return dict(y=y, B=B, sigma_ax0=sigma_ax0, sigma_ay0=sigma_ay0, Qe=Qe, Z=Z, sqrt_diag_R_0=sqrt_diag_R, m0_0=m0, sqrt_diag_V0_0=sqrt_diag_V0, max_iter=max_iter, disp=disp)
+
+    def _apply_optimization_result(self, x, vars_to_estimate):
 
         if vars_to_estimate["sigma_a"]:
-            self.sigma_a = optim_res_ga["x"]["sigma_ax"].item() ** 2
+            self.sigma_a = x["sigma_ax"].item() ** 2
             self.Q = self.Qe*self.sigma_a
 
         if vars_to_estimate["m0"]:
-            self.m0 = optim_res_ga["x"]["m0"][:, np.newaxis]
+            self.m0 = x["m0"][:, np.newaxis]
 
         if vars_to_estimate["V0"]:
-            self.sqrt_diag_V0_value = optim_res_ga["x"]["sqrt_diag_V0"][0]
+            self.sqrt_diag_V0_value = x["sqrt_diag_V0"][0]
             self.V0 = np.diag(np.ones(len(self.m0))*self.sqrt_diag_V0_value**2).astype(np.double)
         
         if vars_to_estimate["R"]:
-            self.sigma_x = optim_res_ga["x"]["sqrt_diag_R"][0]
-            self.sigma_y = optim_res_ga["x"]["sqrt_diag_R"][1]
+            self.sigma_x = x["sqrt_diag_R"][0]
+            self.sigma_y = x["sqrt_diag_R"][1]
             self.R = np.diag([self.sigma_x**2, self.sigma_y**2]).astype(np.double)
 
+        if self.steady_state:
+            self.compute_steady_state()
+
     def run_optimization(self, 
                             x, 
                             y,
                             vars_to_estimate = None, 
                             batch_size = 20,
                             max_iter = 50,
-                            disp = True):
+                            disp = True,
+                            method = "scipy",
+                            time_budget = None):
 
-        if self.batch is None:
-            self.batch = np.array([[x, y]])
+        if method not in OPTIMIZATION_METHODS:
+            raise ValueError(f"Unknown optimization method: {method}. Expected 'scipy' or 'gradient'.")
 
-        elif len(self.batch) < batch_size:
-            self.batch = np.vstack([self.batch, np.array([x, y])])
+        if len(self._batch_window) < batch_size:
+            self._batch_window.append((x, y))
 
-        if len(self.batch) == batch_size:
+        if len(self._batch_window) == batch_size:
 
             if vars_to_estimate is None:
                 vars_to_estimate = { 
@@ -167,7 +1088,10 @@ class KalmanFilterKinematics(OnlineKalmanFilter):
                     "V0" : True 
                 }
 
-            self.optimize(vars_to_estimate, max_iter, disp)
+            if method == "gradient":
+                self.optimize_gradient(vars_to_estimate, max_iter, time_budget=time_budget)
+            else:
+                self.optimize(vars_to_estimate, max_iter, disp)
             self.batch = None
 
             return True
@@ -180,24 +1104,34 @@ class KalmanFilterKinematics(OnlineKalmanFilter):
                                 vars_to_estimate = None, 
                                 batch_size = 20,
                                 max_iter = 50,
-                                disp = True):
+                                disp = True,
+                                backend = "thread",
+                                method = "scipy",
+                                time_budget = None):
 
-        if not self.is_running:
+        if backend not in OPTIMIZATION_BACKENDS:
+            raise ValueError(f"Unknown optimization backend: {backend}. Expected 'thread' or 'process'.")
 
-            if self.batch is None:
-                self.batch = np.array([[x, y]])
+        if method not in OPTIMIZATION_METHODS:
+            raise ValueError(f"Unknown optimization method: {method}. Expected 'scipy' or 'gradient'.")
 
-            elif len(self.batch) < batch_size:
-                self.batch = np.vstack([self.batch, np.array([x, y])])
+        if backend == "process" and method == "gradient":
+            raise ValueError("Gradient optimization keeps its optimizer state in the model and only supports the 'thread' backend.")
+
+        if not self.is_running:
 
-            if len(self.batch) == batch_size:
+            # the window is only modified on the calling thread, the completion callback just requests the reset
+            if self._batch_reset_pending:
+                self._batch_reset_pending = False
+                self.batch = None
 
-                def start_loop(loop):
-                    asyncio.set_event_loop(loop)
-                    loop.run_forever()
+            if len(self._batch_window) < batch_size:
+                self._batch_window.append((x, y))
+
+            if len(self._batch_window) == batch_size:
 
                 def on_completion(future):
-                    self.batch = None
+                    self._batch_reset_pending = True
                     self.is_running = False
                     self._optimization_finished = True
 
@@ -213,43 +1147,152 @@ class KalmanFilterKinematics(OnlineKalmanFilter):
                         "V0" : True 
                     }
 
-                if self.loop is None or self.loop.is_closed():
-                    self.loop = asyncio.new_event_loop()
-
-                if self.thread is None:
-                    self.thread = threading.Thread(target = start_loop, args = (self.loop,))
-                    self.thread.start()
+                if method == "gradient":
+                    get_fit_scheduler().submit(self, self.optimize_gradient, vars_to_estimate, max_iter,
+                        time_budget=time_budget, on_completion=on_completion)
+                else:
+                    if backend == "process":
+                        optimize = self._run_optimization_in_process
+                    else:
+                        optimize = self.optimize
 
-                future = asyncio.run_coroutine_threadsafe(self._run_optimization_async(vars_to_estimate, max_iter, disp), self.loop)
-                future.add_done_callback(on_completion)
+                    get_fit_scheduler().submit(self, optimize, vars_to_estimate, max_iter, disp, on_completion=on_completion)
 
         return self.is_running
-    
-    async def _run_optimization_async(self, *args, **kwargs):
-        func = partial(self.optimize, *args, **kwargs)
-        with ThreadPoolExecutor() as pool:
-            await self.loop.run_in_executor(pool, func)
+
+    def _run_optimization_in_process(self, vars_to_estimate, max_iter, disp):
+        future = get_fit_worker_pool().submit("optimize_tracking", self._optimization_kwargs(max_iter, disp))
+        self._apply_optimization_result(future.result(), vars_to_estimate)
 
     def get_optimization_finished(self):
         return self._optimization_finished
     
     def reset_optimization_loop(self):
         self._optimization_finished = False
-        
-        if self.loop.is_running():
-            self.loop.call_soon_threadsafe(self.loop.stop)
 
-        if self.thread.is_alive():
-            self.thread.join()
+    def enable_metrics(self, enabled = True):
+        set_metrics_enabled(self, KINEMATICS_INSTRUMENTED_METHODS, enabled)
+
+    def get_metrics(self):
+        return get_model_metrics(self, {"batch": len(self._batch_window)})
+
+    def cancel_optimization(self):
+        if get_fit_scheduler().cancel(self):
+            self._batch_reset_pending = True
+            self.is_running = False
+
+class MultiTargetKalmanFilterKinematics:
+
+    def __init__(self,
+                    sigma_a: float,
+                    sigma_x: float,
+                    sigma_y: float,
+                    sqrt_diag_V0_value: float,
+                    fps: int,
+                    capacity: int = 16
+                    ) -> None:
+
+        self.sigma_a=sigma_a
+        self.sigma_x=sigma_x
+        self.sigma_y=sigma_y
+        self.sqrt_diag_V0_value=sqrt_diag_V0_value
+        self.fps=fps
+
+        self.dt = 1.0 / self.fps
+        self.B, self.Z, self.Qe = kinematics_matrices(self.dt)
+        self.Q = self.Qe * self.sigma_a
+        self.R = np.diag([self.sigma_x**2, self.sigma_y**2]).astype(np.double)
+        self.V0 = np.diag(np.ones(6)*self.sqrt_diag_V0_value**2).astype(np.double)
+
+        # targets occupy the first num_targets rows, storage grows geometrically so
+        # that adding and removing targets does not reallocate the state every frame
+        self.num_targets = 0
+        self._x = np.zeros((capacity, 6), dtype=np.double)
+        self._P = np.zeros((capacity, 6, 6), dtype=np.double)
+        self._target_ids = np.zeros(capacity, dtype=np.int64)
+        self._target_index = {}
+        self._next_target_id = 0
+
+    @property
+    def x(self):
+        return self._x[:self.num_targets]
+
+    @property
+    def P(self):
+        return self._P[:self.num_targets]
 
-        self.loop.stop()
-        self.loop.close()
+    @property
+    def target_ids(self):
+        return self._target_ids[:self.num_targets]
 
-        del(self.thread)
-        del(self.loop)
+    def _grow(self):
+        capacity = max(2 * len(self._x), 1)
+        for name in ("_x", "_P", "_target_ids"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.num_targets] = old[:self.num_targets]
+            setattr(self, name, new)
 
-        self.thread = None
-        self.loop = None
+    def add_target(self, pos_x0 = 0, pos_y0 = 0, vel_x0 = 0, vel_y0 = 0, acc_x0 = 0, acc_y0 = 0, target_id = None):
+
+        if target_id is None:
+            target_id = self._next_target_id
+        if target_id in self._target_index:
+            raise ValueError(f"Target {target_id} is already being tracked.")
+        self._next_target_id = max(self._next_target_id, target_id + 1)
+
+        if self.num_targets == len(self._x):
+            self._grow()
+
+        index = self.num_targets
+        self._x[index] = np.nan_to_num([pos_x0, vel_x0, acc_x0, pos_y0, vel_y0, acc_y0])
+        self._P[index] = self.V0
+        self._target_ids[index] = target_id
+        self._target_index[target_id] = index
+        self.num_targets += 1
+        return target_id
+
+    def remove_target(self, target_id):
+
+        index = self._target_index.pop(target_id)
+        last = self.num_targets - 1
+        if index != last:
+            # move the last target into the freed row to keep the active rows contiguous
+            self._x[index] = self._x[last]
+            self._P[index] = self._P[last]
+            self._target_ids[index] = self._target_ids[last]
+            self._target_index[int(self._target_ids[index])] = index
+        self.num_targets = last
+
+    def get_target_index(self, target_id):
+        return self._target_index[target_id]
+
+    def predict(self):
+
+        n = self.num_targets
+        self._x[:n] = self._x[:n] @ self.B.T
+        self._P[:n] = self.B @ self._P[:n] @ self.B.T + self.Q
+
+    def update(self, Y, mask = None):
+
+        Y = np.asarray(Y, dtype=np.double).reshape((self.num_targets, 2))
+
+        # a target is updated only if both coordinates were observed and it is not masked out
+        observed = ~np.isnan(Y).any(axis=1)
+        if mask is not None:
+            observed &= np.asarray(mask, dtype=bool).reshape(self.num_targets)
+        index = np.flatnonzero(observed)
+        if len(index) == 0:
+            return
+
+        x = self._x[index]
+        P = self._P[index]
+        PZT = P @ self.Z.T
+        S = self.Z @ PZT + self.R
+        K = np.linalg.solve(S, PZT.transpose(0, 2, 1)).transpose(0, 2, 1)
+        innovation = Y[index] - x @ self.Z.T
+        self._x[index] = x + np.einsum("nij,nj->ni", K, innovation)
+        self._P[index] = P - K @ S @ K.transpose(0, 2, 1)
 
 class KalmanFilterLinearRegression(TimeVaryingOnlineKalmanFilter):
 
@@ -282,19 +1325,149 @@ class KalmanFilterLinearRegression(TimeVaryingOnlineKalmanFilter):
         self.Q = np.zeros(shape=((len(self.x), len(self.x))))
         self.R = np.array([[1.0/self.likelihood_precision_coef]])
 
+        self._checked_dynamics = None
+        self._static_dynamics = False
+
+        self._pdf_grid_key = None
+        self._metrics = None
+
         super().__init__()
 
+    def _has_static_dynamics(self):
+        # with B = I and Q = 0 the prediction step leaves x and P unchanged
+        if self._checked_dynamics is None or self._checked_dynamics[0] is not self.B or self._checked_dynamics[1] is not self.Q:
+            self._checked_dynamics = (self.B, self.Q)
+            self._static_dynamics = np.array_equal(self.B, np.eye(len(self.B))) and not np.any(self.Q)
+        return self._static_dynamics
+
     def predict(self):
+        if self._has_static_dynamics():
+            return
         self.x, self.P = super().predict(x = self.x, P = self.P, B = self.B, Q = self.Q)
 
     def update(self, x, y):
         if not isinstance(x, list):
             x = [x]
-        self.x, self.P = super().update(y = np.array(y, dtype=np.float64), x = self.x, P = self.P, Z = np.array(x).reshape((1, -1)), R = self.R)
+
+        z = np.array(x, dtype=np.float64).reshape(-1)
+        y = float(np.asarray(y, dtype=np.float64).reshape(-1)[0])
+        if np.isnan(y):
+            return
+
         if self.x.ndim == 1:
             self.x = self.x[:, np.newaxis]
+
+        # scalar observation, so the covariance update is a rank-one (Sherman-Morrison) downdate in O(n^2)
+        Pz = self.P @ z
+        s = z @ Pz + self.R[0, 0]
+        self.x = self.x + (Pz * ((y - z @ self.x[:, 0]) / s))[:, np.newaxis]
+        self.P = self.P - np.outer(Pz, Pz / s)
+
+    def update_batch(self, X, y):
+
+        Z = np.asarray(X, dtype=np.float64).reshape((-1, self.n_features))
+        y = np.asarray(y, dtype=np.float64).reshape(-1)
+
+        observed = ~np.isnan(y)
+        if not observed.all():
+            Z = Z[observed]
+            y = y[observed]
+        if len(y) == 0:
+            return
+
+        if self.x.ndim == 1:
+            self.x = self.x[:, np.newaxis]
+
+        # k observations at once, a rank-k update in O(n^2 k)
+        PZT = self.P @ Z.T
+        S = Z @ PZT + self.R[0, 0] * np.eye(len(y))
+        K = np.linalg.solve(S, PZT.T).T
+        self.x = self.x + K @ (y - Z @ self.x[:, 0])[:, np.newaxis]
+        self.P = self.P - K @ PZT.T
     
-    def pdf(self, x0 = 0, x1 = 1, xsteps = 100, y0 = 0, y1 = 1, ysteps = 100):
+    def update_from_buffer(self, buffer, dtype = "float64"):
+        # each row holds the features followed by the observation
+        observation = array_from_buffer(buffer, dtype, (self.n_features + 1,))
+        return self.update(observation[:-1], observation[-1])
+
+    def update_batch_from_buffer(self, buffer, dtype = "float64"):
+        observations = array_from_buffer(buffer, dtype, (-1, self.n_features + 1))
+        return self.update_batch(observations[:, :-1], observations[:, -1])
+
+    def get_buffer(self, name, dtype = None):
+        return array_to_buffer(getattr(self, name), dtype)
+
+    def _filter_batch(self, X, y, x0, P0, store_covariances):
+
+        # the same steps as predict and update, the prediction is skipped for static dynamics and each
+        # scalar observation is a rank-one downdate, so a step costs O(n^2) instead of O(n^3)
+        X = np.asarray(X, dtype=np.double).reshape((-1, self.n_features))
+        y = np.asarray(y, dtype=np.double).reshape(-1)
+        static_dynamics = self._has_static_dynamics()
+        r = self.R[0, 0]
+        BT = self.B.T
+
+        num_timesteps = len(y)
+        n = self.n_features
+        predicted_means = np.empty((num_timesteps, n))
+        filtered_means = np.empty((num_timesteps, n))
+        predicted_covariances = np.empty((num_timesteps, n, n)) if store_covariances else None
+        filtered_covariances = np.empty((num_timesteps, n, n)) if store_covariances else None
+
+        x = np.array(x0, dtype=np.double).reshape(n)
+        P = np.array(P0, dtype=np.double)
+
+        for t in range(num_timesteps):
+            if not static_dynamics:
+                x = self.B @ x
+                P = self.B @ P @ BT + self.Q
+
+            predicted_means[t] = x
+            if store_covariances:
+                predicted_covariances[t] = P
+
+            if not np.isnan(y[t]):
+                z = X[t]
+                Pz = P @ z
+                s = z @ Pz + r
+                x = x + Pz * ((y[t] - z @ x) / s)
+                P -= np.outer(Pz, Pz / s)
+
+            filtered_means[t] = x
+            if store_covariances:
+                filtered_covariances[t] = P
+
+        return predicted_means, predicted_covariances, filtered_means, filtered_covariances, P
+
+    def filter_batch(self, X, y, x0 = None, P0 = None, store_covariances = True):
+
+        x0 = self.x if x0 is None else x0
+        P0 = self.P if P0 is None else P0
+        _, _, means, covariances, _ = self._filter_batch(X, y, x0, P0, store_covariances)
+        return means, covariances
+
+    def smooth_batch(self, X, y, x0 = None, P0 = None):
+
+        x0 = self.x if x0 is None else x0
+        P0 = self.P if P0 is None else P0
+
+        if self._has_static_dynamics():
+            # the weights do not change over time, so every smoothed estimate is the last filtered one
+            _, _, filtered_means, _, P = self._filter_batch(X, y, x0, P0, store_covariances=False)
+            num_timesteps = len(filtered_means)
+            return np.tile(filtered_means[-1], (num_timesteps, 1)), np.tile(P, (num_timesteps, 1, 1))
+
+        filtered = self._filter_batch(X, y, x0, P0, store_covariances=True)
+        return rts_smooth_batch(self.B, *filtered[:4])
+
+    def enable_metrics(self, enabled = True):
+        set_metrics_enabled(self, LINEAR_REGRESSION_INSTRUMENTED_METHODS, enabled)
+
+    def get_metrics(self):
+        pdf_grid_size = 0 if self._pdf_grid_key is None else self._pdf_values.size
+        return get_model_metrics(self, {"pdf_grid": pdf_grid_size})
+
+    def pdf(self, x0 = 0, x1 = 1, xsteps = 100, y0 = 0, y1 = 1, ysteps = 100, dtype = "float64", truncate = None):
 
         self.x0 = x0
         self.x1 = x1
@@ -302,10 +1475,51 @@ class KalmanFilterLinearRegression(TimeVaryingOnlineKalmanFilter):
         self.y0 = y0
         self.y1 = y1
         self.ysteps = ysteps
-        
-        rv = multivariate_normal(self.x.flatten(), self.P)
-        xpos = np.linspace(x0, x1, xsteps)
-        ypos = np.linspace(y0, y1, ysteps)
-        xx, yy = np.meshgrid(xpos, ypos)
-        pos = np.dstack((xx, yy))
-        self.pdf_values = rv.pdf(pos)
+
+        grid_key = (x0, x1, xsteps, y0, y1, ysteps, np.dtype(dtype))
+        if self._pdf_grid_key != grid_key:
+            self._pdf_grid_key = grid_key
+            self._pdf_xpos = np.linspace(x0, x1, xsteps)
+            self._pdf_ypos = np.linspace(y0, y1, ysteps)
+            self._pdf_scratch = np.empty((ysteps, xsteps), dtype=np.double)
+            self._pdf_values = np.empty((ysteps, xsteps), dtype=dtype)
+
+        mean = self.x.reshape(-1)
+        L = np.linalg.cholesky(self.P)
+        L_inv = np.linalg.inv(L)
+        log_norm = -np.log(2 * np.pi) - np.log(np.diag(L)).sum()
+
+        xpos = self._pdf_xpos
+        ypos = self._pdf_ypos
+        scratch = self._pdf_scratch
+        values = self._pdf_values
+
+        if truncate is not None:
+            # only evaluate the bounding box within truncate standard deviations of the mean, the rest is zero
+            values.fill(0)
+            x_index = np.flatnonzero(np.abs(xpos - mean[0]) <= truncate * np.sqrt(self.P[0, 0]))
+            y_index = np.flatnonzero(np.abs(ypos - mean[1]) <= truncate * np.sqrt(self.P[1, 1]))
+            if len(x_index) == 0 or len(y_index) == 0:
+                self.pdf_values = self._pdf_values
+                return
+            x_slice = slice(x_index[0], x_index[-1] + 1)
+            y_slice = slice(y_index[0], y_index[-1] + 1)
+            xpos = xpos[x_slice]
+            ypos = ypos[y_slice]
+            scratch = scratch[y_slice, x_slice]
+            values = values[y_slice, x_slice]
+
+        # whitened coordinates u = L^-1 (pos - mean), separable along the grid axes
+        dx = xpos - mean[0]
+        dy = ypos - mean[1]
+        u0 = L_inv[0, 0] * dx
+        np.add((L_inv[1, 1] * dy)[:, np.newaxis], (L_inv[1, 0] * dx)[np.newaxis, :], out=scratch)
+        np.square(scratch, out=scratch)
+        scratch += (u0 * u0)[np.newaxis, :]
+        scratch *= -0.5
+        scratch += log_norm
+        np.exp(scratch, out=values)
+
+        # pdf_values is the reused grid buffer and is overwritten by the next call, so callers that
+        # keep the values must copy them. MultivariatePDF converts them into a new managed array
+        self.pdf_values = self._pdf_values
@@ -0,0 +1,62 @@
+using Newtonsoft.Json;
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Runtime.InteropServices;
+using Bonsai.ML.Tests.Utilities;
+
+namespace Bonsai.ML.Hmm.Python.Tests;
+
+/// <summary>
+/// Tests for online EM fitting of the hidden Markov model.
+/// </summary>
+[TestClass]
+public class OnlineEmTest
+{
+    private static readonly string basePath = Path.Combine(AppDomain.CurrentDomain.BaseDirectory);
+    private static Dictionary<string, object> output = [];
+
+    private static void RunPythonScript(string basePath)
+    {
+        var pythonExec = RuntimeInformation.IsOSPlatform(OSPlatform.Windows)
+            ? "python"
+            : "python3";
+        var scriptPath = Path.Combine(basePath, "bootstrap_test_environment.py");
+        ProcessHelper.RunProcess(pythonExec, $"\"{scriptPath}\" {basePath} 2000 --script online_em.py");
+
+        Console.WriteLine("Run python script finished.");
+    }
+
+    /// <summary>
+    /// Setup for the tests.
+    /// </summary>
+    [ClassInitialize]
+    public static void TestSetup(TestContext context)
+    {
+        Directory.CreateDirectory(basePath);
+        RunPythonScript(basePath);
+        var jsonString = File.ReadAllText(Path.Combine(basePath, "python-online-em.json"));
+        output = JsonConvert.DeserializeObject<Dictionary<string, object>>(jsonString) ?? [];
+    }
+
+    /// <summary>
+    /// Checks that inference after fit_online_em uses the fitted parameters rather than stale cached ones.
+    /// </summary>
+    [TestMethod]
+    public void InferenceAfterOnlineEmMatchesFreshModel()
+    {
+        Assert.IsTrue((bool)output["predictions_match"]);
+        Assert.IsTrue(Convert.ToDouble(output["max_log_alpha_difference"]) < 1e-9);
+    }
+
+    /// <summary>
+    /// Checks that each online EM update in fit_async only processes the rows added since the previous update.
+    /// </summary>
+    [TestMethod]
+    public void OnlineEmUpdatesOnlyProcessNewRows()
+    {
+        Assert.IsTrue(Convert.ToInt64(output["online_em_updates"]) > 0);
+        Assert.AreEqual(20, Convert.ToInt64(output["online_em_max_update_rows"]));
+        Assert.AreEqual(2000, Convert.ToInt64(output["online_em_total_update_rows"]));
+    }
+}
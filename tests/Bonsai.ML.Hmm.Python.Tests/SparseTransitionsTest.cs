@@ -0,0 +1,53 @@
+using Newtonsoft.Json;
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Runtime.InteropServices;
+using Bonsai.ML.Tests.Utilities;
+
+namespace Bonsai.ML.Hmm.Python.Tests;
+
+/// <summary>
+/// Tests for the sparse forward pass of the hidden Markov model.
+/// </summary>
+[TestClass]
+public class SparseTransitionsTest
+{
+    private static readonly string basePath = Path.Combine(AppDomain.CurrentDomain.BaseDirectory);
+    private static Dictionary<string, object> output = [];
+
+    private static void RunPythonScript(string basePath)
+    {
+        var pythonExec = RuntimeInformation.IsOSPlatform(OSPlatform.Windows)
+            ? "python"
+            : "python3";
+        var scriptPath = Path.Combine(basePath, "bootstrap_test_environment.py");
+        ProcessHelper.RunProcess(pythonExec, $"\"{scriptPath}\" {basePath} 2000 --script sparse_transitions.py");
+
+        Console.WriteLine("Run python script finished.");
+    }
+
+    /// <summary>
+    /// Setup for the tests.
+    /// </summary>
+    [ClassInitialize]
+    public static void TestSetup(TestContext context)
+    {
+        Directory.CreateDirectory(basePath);
+        RunPythonScript(basePath);
+        var jsonString = File.ReadAllText(Path.Combine(basePath, "python-sparse-transitions.json"));
+        output = JsonConvert.DeserializeObject<Dictionary<string, object>>(jsonString) ?? [];
+    }
+
+    /// <summary>
+    /// Checks that zero transitions stay unreachable in the sparse forward pass, which then matches the dense one.
+    /// </summary>
+    [TestMethod]
+    public void ZeroTransitionsMatchDenseForwardPass()
+    {
+        Assert.AreEqual(0.0, Convert.ToDouble(output["sparse_approximation_error"]));
+        Assert.AreEqual(0.0, Convert.ToDouble(output["sparse_max_unreachable_state_probability"]));
+        Assert.IsTrue((bool)output["sparse_predictions_match"]);
+        Assert.IsTrue(Convert.ToDouble(output["sparse_max_probability_difference"]) < 1e-9);
+    }
+}
@@ -0,0 +1,77 @@
+import sys
+import os
+import subprocess
+import argparse
+
+def get_base_dir(base_dir = None):
+    # function to get the base directory
+    if base_dir is not None:
+        return base_dir
+    try:
+        return os.path.dirname(os.path.realpath(__file__))
+    except:
+        return os.getcwd()
+    
+def get_pip_path(venv_path: str = None):
+    if venv_path is None:
+        venv_path = get_venv_path()
+    if sys.platform.startswith('linux'):
+        return os.path.join(venv_path, 'bin', 'pip')
+    else:
+        return os.path.join(venv_path, 'Scripts', 'pip.exe')
+
+def create_venv(parent_dir = None):
+    # function to create a virtual environment
+    if parent_dir is None:
+        parent_dir = os.path.dirname(os.path.realpath(__file__))
+    venv_path = os.path.join(parent_dir, ".venv")
+    subprocess.check_call([sys.executable, "-m", "venv", venv_path])
+    return venv_path
+
+def activate_venv(venv_path = None):
+    # function to activate the virtual environment
+    if venv_path is None:
+        venv_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), '.venv')
+    if sys.platform.startswith('linux'):
+        bin_path = os.path.join(venv_path, 'bin')
+        os.environ["PATH"] = os.pathsep.join([bin_path, *os.environ.get("PATH", "").split(os.pathsep)])
+        sys.path.insert(0, os.path.join(venv_path, 'lib', f'python{sys.version_info.major}.{sys.version_info.minor}', 'site-packages'))
+    else:
+        bin_path = os.path.join(venv_path, 'Scripts')
+        os.environ["PATH"] = os.pathsep.join([bin_path, *os.environ.get("PATH", "").split(os.pathsep)])
+        sys.path.insert(0, os.path.join(venv_path, 'Lib', 'site-packages'))
+
+def install(venv_path: str = None, pip_args: list[str] = None):
+    # function to install pip packages into a virtual environment
+    if venv_path is None:
+        venv_path = get_venv_path()
+    pip_path = get_pip_path(venv_path)
+    if pip_args is None:
+        raise ValueError("pip_args must be provided")
+    subprocess.check_call([pip_path, "install", *pip_args])
+
+parser = argparse.ArgumentParser()
+parser.add_argument("base_dir", type=str, default=None)
+parser.add_argument("n_samples", type=int, default=1)
+parser.add_argument("--script", type=str, default="online_em.py")
+args = parser.parse_args()
+
+base_dir = get_base_dir(args.base_dir)
+venv_path = create_venv(base_dir)
+activate_venv(venv_path)
+install(venv_path, ["--no-cache-dir", "numpy", "cython"])
+install(venv_path, ["--no-cache-dir", "ssm@git+https://github.com/lindermanlab/ssm@6c856ad3967941d176eb348bcd490cfaaa08ba60"])
+
+if sys.platform.startswith('linux'):
+    python_path = os.path.join(venv_path, "bin", "python")
+else:
+    python_path = os.path.join(venv_path, "Scripts", "python.exe")
+
+script_path = os.path.join(base_dir, args.script)
+process = subprocess.Popen([python_path, script_path, base_dir, str(args.n_samples)])
+return_code = process.wait()
+
+if return_code == 0:
+    print("Script completed successfully.")
+else:
+    print(f"Script exited with errors. Return code: {return_code}")
\ No newline at end of file
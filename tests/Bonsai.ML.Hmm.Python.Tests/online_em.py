@@ -0,0 +1,77 @@
+import numpy as np
+import importlib.util
+import json
+import argparse
+import os
+import time
+
+# Parse arguments
+parser = argparse.ArgumentParser()
+parser.add_argument("base_dir", type=str, default=None)
+parser.add_argument("n_samples", type=int, default=1)
+args = parser.parse_args()
+
+# Load the module embedded in Bonsai.ML.Hmm.Python, which is copied next to this script
+spec = importlib.util.spec_from_file_location("hmm_module", os.path.join(args.base_dir, "hmm_module.py"))
+hmm_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(hmm_module)
+
+num_states = 3
+dimensions = 2
+
+# Sample observations from a sticky chain of well separated Gaussian states
+rng = np.random.default_rng(0)
+means = np.array([[-5.0, 0.0], [0.0, 5.0], [5.0, 0.0]])
+transition_matrix = np.full((num_states, num_states), 0.025) + 0.925 * np.eye(num_states)
+states = np.empty(args.n_samples, dtype=int)
+states[0] = 0
+for n in range(1, args.n_samples):
+    states[n] = rng.choice(num_states, p=transition_matrix[states[n - 1]])
+observations = means[states] + rng.normal(size=(args.n_samples, dimensions))
+
+# Inference before fitting fills the parameter cache, which the online EM updates must invalidate
+model = hmm_module.HiddenMarkovModel(num_states, dimensions, "gaussian", "stationary")
+model.infer_state(observations[0])
+for window in np.array_split(observations[:args.n_samples // 2], 10):
+    model.fit_online_em(window)
+
+params = model.params
+reference = hmm_module.HiddenMarkovModel(
+    num_states, dimensions, "gaussian", "stationary",
+    initial_state_distribution=params[0][0],
+    transitions_params=params[1],
+    observations_params=params[2]
+)
+
+model.log_alpha = None
+test_observations = observations[args.n_samples // 2:]
+predictions = np.array([model.infer_state(observation) for observation in test_observations])
+reference_predictions = np.array([reference.infer_state(observation) for observation in test_observations])
+
+# Online EM through fit_async must only process the rows added since the previous update
+batch_size = 20
+streaming_model = hmm_module.HiddenMarkovModel(num_states, dimensions, "gaussian", "stationary")
+update_rows = []
+fit_online_em = streaming_model.fit_online_em
+def record_update(data, **kwargs):
+    update_rows.append(len(data))
+    fit_online_em(data, **kwargs)
+streaming_model.fit_online_em = record_update
+
+for observation in observations:
+    streaming_model.fit_async(list(observation), batch_size=batch_size, fit_method="online_em")
+    while streaming_model.is_running:
+        time.sleep(0.001)
+    if streaming_model.get_fit_finished():
+        streaming_model.reset_fit_loop()
+
+output = {
+    "predictions_match": bool(np.array_equal(predictions, reference_predictions)),
+    "max_log_alpha_difference": float(np.abs(model.log_alpha - reference.log_alpha).max()),
+    "online_em_updates": len(update_rows),
+    "online_em_max_update_rows": max(update_rows),
+    "online_em_total_update_rows": sum(update_rows)
+}
+
+with open(f"{args.base_dir}/python-online-em.json", "w") as f:
+    json.dump(output, f)
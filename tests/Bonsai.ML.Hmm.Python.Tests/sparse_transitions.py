@@ -0,0 +1,70 @@
+import numpy as np
+import importlib.util
+import json
+import argparse
+import os
+
+# Parse arguments
+parser = argparse.ArgumentParser()
+parser.add_argument("base_dir", type=str, default=None)
+parser.add_argument("n_samples", type=int, default=1)
+args = parser.parse_args()
+
+# Load the module embedded in Bonsai.ML.Hmm.Python, which is copied next to this script
+spec = importlib.util.spec_from_file_location("hmm_module", os.path.join(args.base_dir, "hmm_module.py"))
+hmm_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(hmm_module)
+
+num_states = 4
+dimensions = 2
+tolerance = 1e-9
+
+# A cycle over the first three states and a fourth state that none of them can reach. Every transition
+# is either zero or above the tolerance, so pruning removes no probability mass and the sparse
+# forward pass must match the dense one exactly
+transition_matrix = np.zeros((num_states, num_states))
+for k in range(3):
+    transition_matrix[k, k] = 0.9
+    transition_matrix[k, (k + 1) % 3] = 0.1
+transition_matrix[3, 3] = 1.0
+initial_state_distribution = np.array([1 / 3, 1 / 3, 1 / 3, 0.0])
+means = np.array([[-5.0, 0.0], [0.0, 5.0], [5.0, 0.0], [0.0, -50.0]])
+
+rng = np.random.default_rng(0)
+states = np.empty(args.n_samples, dtype=int)
+states[0] = 0
+for n in range(1, args.n_samples):
+    states[n] = rng.choice(3, p=transition_matrix[states[n - 1], :3])
+observations = means[states] + rng.normal(size=(args.n_samples, dimensions))
+# observations explained far better by the unreachable state must not move the filter onto it
+observations[args.n_samples // 2::10] = means[3]
+
+def create_model():
+    model = hmm_module.HiddenMarkovModel(num_states, dimensions, "gaussian", "stationary")
+    # ssm takes the initial state distribution and the transition matrix as logarithms
+    model.update_params(np.log(initial_state_distribution), (np.log(transition_matrix),), (means, np.stack([np.eye(dimensions)] * num_states)))
+    return model
+
+dense_model = create_model()
+sparse_model = create_model()
+approximation_error = sparse_model.set_sparse_transitions(tolerance)
+
+max_probability_difference = 0.0
+max_unreachable_state_probability = 0.0
+predictions_match = True
+for observation in observations:
+    dense_prediction = dense_model.infer_state(observation)
+    sparse_prediction = sparse_model.infer_state(observation)
+    predictions_match = predictions_match and dense_prediction == sparse_prediction
+    max_unreachable_state_probability = max(max_unreachable_state_probability, float(sparse_model.state_probabilities[3]))
+    max_probability_difference = max(max_probability_difference, float(np.abs(sparse_model.state_probabilities - dense_model.state_probabilities).max()))
+
+output = {
+    "sparse_approximation_error": approximation_error,
+    "sparse_predictions_match": bool(predictions_match),
+    "sparse_max_probability_difference": max_probability_difference,
+    "sparse_max_unreachable_state_probability": max_unreachable_state_probability
+}
+
+with open(f"{args.base_dir}/python-sparse-transitions.json", "w") as f:
+    json.dump(output, f)
@@ -0,0 +1,82 @@
+using Newtonsoft.Json;
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Runtime.InteropServices;
+using Bonsai.ML.Tests.Utilities;
+
+namespace Bonsai.ML.Lds.Python.Tests;
+
+/// <summary>
+/// Tests for the Kalman filter used by the Kinematics operators.
+/// </summary>
+[TestClass]
+public class KalmanFilterKinematicsTest
+{
+    private static readonly string basePath = Path.Combine(AppDomain.CurrentDomain.BaseDirectory);
+    private static Dictionary<string, double?> output = [];
+
+    private static void RunPythonScript(string basePath)
+    {
+        var pythonExec = RuntimeInformation.IsOSPlatform(OSPlatform.Windows)
+            ? "python"
+            : "python3";
+        var scriptPath = Path.Combine(basePath, "bootstrap_test_environment.py");
+        ProcessHelper.RunProcess(pythonExec, $"\"{scriptPath}\" {basePath} 5000 --script kalman_filter_kinematics.py");
+
+        Console.WriteLine("Run python script finished.");
+    }
+
+    /// <summary>
+    /// Setup for the tests.
+    /// </summary>
+    [ClassInitialize]
+    public static void TestSetup(TestContext context)
+    {
+        Directory.CreateDirectory(basePath);
+        RunPythonScript(basePath);
+        var jsonString = File.ReadAllText(Path.Combine(basePath, "python-kalman-filter-kinematics.json"));
+        output = JsonConvert.DeserializeObject<Dictionary<string, double?>>(jsonString) ?? [];
+    }
+
+    /// <summary>
+    /// Checks that the default model reaches steady state and then matches the full recursion.
+    /// </summary>
+    [TestMethod]
+    public void SteadyStateMatchesFullRecursion()
+    {
+        Assert.IsTrue(output["steady_state_frame"].HasValue, "The model never reached steady state.");
+        Assert.IsTrue(output["steady_state_max_state_difference"] < 1e-6);
+    }
+
+    /// <summary>
+    /// Checks that batch filtering with partially missing observations matches lds_python and the online filter.
+    /// </summary>
+    [TestMethod]
+    public void BatchFilterMatchesMissingValuesFilter()
+    {
+        Assert.IsTrue(output["batch_max_state_difference"] < 1e-9);
+        Assert.IsTrue(output["batch_max_covariance_difference"] < 1e-9);
+        Assert.IsTrue(output["batch_max_online_state_difference"] < 1e-9);
+    }
+
+    /// <summary>
+    /// Checks that the likelihood used by gradient optimization matches the batch filter with partially missing observations.
+    /// </summary>
+    [TestMethod]
+    public void GradientLikelihoodMatchesBatchFilter()
+    {
+        Assert.IsTrue(output["gradient_log_likelihood_difference"] < 1e-9);
+    }
+
+    /// <summary>
+    /// Checks that the numba kernels match the numpy backend on the same sequence with partially missing observations.
+    /// </summary>
+    [TestMethod]
+    public void NumbaBackendMatchesNumpyBackend()
+    {
+        Assert.AreEqual(1.0, output["numba_backend_active"], "The numba backend could not be selected.");
+        Assert.IsTrue(output["backend_max_state_difference"] < 1e-9);
+        Assert.IsTrue(output["backend_max_covariance_difference"] < 1e-9);
+    }
+}
@@ -53,12 +53,14 @@ def install(venv_path: str = None, pip_args: list[str] = None):
 parser = argparse.ArgumentParser()
 parser.add_argument("base_dir", type=str, default=None)
 parser.add_argument("n_samples", type=int, default=1)
+parser.add_argument("--script", type=str, default="receptive_field.py")
 args = parser.parse_args()
 
 base_dir = get_base_dir(args.base_dir)
 venv_path = create_venv(base_dir)
 activate_venv(venv_path)
 install(venv_path, ["--no-cache-dir", "pandas"])
+install(venv_path, ["--no-cache-dir", "numba"])
 install(venv_path, ["--no-cache-dir", "lds_python@git+https://github.com/ncguilbeault/lds_python@dc7a2e02892033734746bc0615dc294f5b43f672"])
 
 if sys.platform.startswith('linux'):
@@ -66,7 +68,7 @@ if sys.platform.startswith('linux'):
 else:
     python_path = os.path.join(venv_path, "Scripts", "python.exe")
 
-script_path = os.path.join(base_dir, "receptive_field.py")
+script_path = os.path.join(base_dir, args.script)
 process = subprocess.Popen([python_path, script_path, base_dir, str(args.n_samples)])
 return_code = process.wait()
 
@@ -0,0 +1,118 @@
+import numpy as np
+import importlib.util
+import json
+import argparse
+import os
+import lds.inference
+
+# Parse arguments
+parser = argparse.ArgumentParser()
+parser.add_argument("base_dir", type=str, default=None)
+parser.add_argument("n_samples", type=int, default=1)
+args = parser.parse_args()
+
+# Load the module embedded in Bonsai.ML.Lds.Python, which is copied next to this script
+spec = importlib.util.spec_from_file_location("lds_module", os.path.join(args.base_dir, "lds_module.py"))
+lds_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(lds_module)
+
+# Default KFModelParameters
+model_kwargs = dict(
+    pos_x0=0, pos_y0=0, vel_x0=0, vel_y0=0, acc_x0=0, acc_y0=0,
+    sigma_a=10000, sigma_x=100, sigma_y=100, sqrt_diag_V0_value=0.001, fps=60
+)
+
+# Simulate a noisy constant-acceleration trajectory
+rng = np.random.default_rng(0)
+dt = 1.0 / model_kwargs["fps"]
+accelerations = np.cumsum(rng.normal(scale=100, size=(args.n_samples, 2)), axis=0)
+velocities = np.cumsum(accelerations * dt, axis=0)
+positions = np.cumsum(velocities * dt, axis=0)
+observations = positions + rng.normal(scale=model_kwargs["sigma_x"], size=positions.shape)
+
+output = {}
+
+# Steady state mode must switch to the fixed gain and then follow the full recursion
+steady_state_model = lds_module.KalmanFilterKinematics(**model_kwargs, steady_state=True)
+full_model = lds_module.KalmanFilterKinematics(**model_kwargs)
+
+steady_state_frame = None
+max_state_difference = 0.0
+for n, (x, y) in enumerate(observations):
+    steady_state_model.predict()
+    steady_state_model.update(x, y)
+    full_model.predict()
+    full_model.update(x, y)
+    if steady_state_frame is None and steady_state_model._on_steady_state:
+        steady_state_frame = n
+    if steady_state_frame is not None:
+        difference = np.abs(steady_state_model.x - full_model.x).max() / max(np.abs(full_model.x).max(), 1.0)
+        max_state_difference = max(max_state_difference, float(difference))
+
+output["steady_state_frame"] = steady_state_frame
+output["steady_state_max_state_difference"] = max_state_difference
+
+# Batch filtering with partially missing rows must reproduce lds_python and the online filter
+missing_observations = observations.copy()
+missing_observations[rng.random(args.n_samples) < 0.05, 0] = np.nan
+missing_observations[rng.random(args.n_samples) < 0.05, 1] = np.nan
+missing_observations[rng.random(args.n_samples) < 0.02] = np.nan
+missing_observations[0] = observations[0]
+
+batch_model = lds_module.KalmanFilterKinematics(**model_kwargs)
+batch_means, batch_covariances = batch_model.filter_batch(missing_observations)
+reference = lds.inference.filterLDS_SS_withMissingValues_np(
+    y=missing_observations.T, B=batch_model.B, Q=batch_model.Q, m0=batch_model.m0,
+    V0=batch_model.V0, Z=batch_model.Z, R=batch_model.R)
+reference_means = reference["xnn"][:, 0, :].T
+reference_covariances = np.moveaxis(reference["Vnn"], -1, 0)
+
+online_model = lds_module.KalmanFilterKinematics(**model_kwargs)
+online_means = np.empty_like(batch_means)
+for n, (x, y) in enumerate(missing_observations):
+    online_model.predict()
+    online_model.update(x, y)
+    online_means[n] = online_model.x[:, 0]
+
+scale = max(np.abs(reference_means).max(), 1.0)
+output["batch_max_state_difference"] = float(np.abs(batch_means - reference_means).max() / scale)
+output["batch_max_covariance_difference"] = float(np.abs(batch_covariances - reference_covariances).max() / np.abs(reference_covariances).max())
+output["batch_max_online_state_difference"] = float(np.abs(batch_means - online_means).max() / scale)
+
+# The likelihood maximised by the gradient optimizer must be the innovations likelihood of the batch filter
+predicted_means, predicted_covariances, _, _ = lds_module.kalman_filter_batch(
+    missing_observations, batch_model.B, batch_model.Q, batch_model.Z, batch_model.R, batch_model.m0, batch_model.V0)
+filter_log_likelihood = 0.0
+for y, mean, covariance in zip(missing_observations, predicted_means, predicted_covariances):
+    if np.isnan(y).any():
+        continue
+    S = batch_model.Z @ covariance @ batch_model.Z.T + batch_model.R
+    e = y - batch_model.Z @ mean
+    filter_log_likelihood -= 0.5 * (np.linalg.slogdet(S)[1] + e @ np.linalg.solve(S, e) + len(y) * np.log(2 * np.pi))
+
+n = batch_model.B.shape[0]
+gradient_log_likelihood, _ = lds_module.kalman_log_likelihood_gradient(
+    missing_observations, batch_model.B, batch_model.Z, batch_model.Q, batch_model.R, batch_model.m0, batch_model.V0,
+    np.zeros((1, n, n)), np.zeros((1, 2, 2)), np.zeros((1, n)), np.zeros((1, n, n)))
+output["gradient_log_likelihood_difference"] = float(abs(gradient_log_likelihood - filter_log_likelihood) / abs(filter_log_likelihood))
+
+# The compiled kernels must follow the numpy backend on the same sequence
+numpy_model = lds_module.KalmanFilterKinematics(**model_kwargs)
+numba_model = lds_module.KalmanFilterKinematics(**model_kwargs)
+output["numba_backend_active"] = float(numba_model.set_kernel_backend("numba") == "numba")
+
+max_backend_state_difference = 0.0
+max_backend_covariance_difference = 0.0
+for x, y in missing_observations:
+    numpy_model.predict()
+    numpy_model.update(x, y)
+    numba_model.predict()
+    numba_model.update(x, y)
+    max_backend_state_difference = max(max_backend_state_difference, float(np.abs(numba_model.x - numpy_model.x).max() / max(np.abs(numpy_model.x).max(), 1.0)))
+    max_backend_covariance_difference = max(max_backend_covariance_difference, float(np.abs(numba_model.P - numpy_model.P).max() / np.abs(numpy_model.P).max()))
+
+output["backend_max_state_difference"] = max_backend_state_difference
+output["backend_max_covariance_difference"] = max_backend_covariance_difference
+
+with open(f"{args.base_dir}/python-kalman-filter-kinematics.json", "w") as f:
+    json.dump(output, f)